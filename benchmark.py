@@ -0,0 +1,192 @@
+"""Compares the regex record parser with the column-slicing decoders of uct.py and measures Grid operations on synthetic models.
+
+Usage: python benchmark.py <uct file> [<uct file> ...] [--repeat N]
+       python benchmark.py --sizes 1000 10000 100000 [--areas N] [--repeat N] [--json results.json]
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from uct import Grid, Node, rgx, decoders, element_slots, element_values, interned_fields, uct_export
+from generate import generate, file_name
+
+
+def section_lines(text: str, class_name: str) -> list:
+    lines = []
+    for match in rgx[class_name + "s"].finditer(text):
+        lines.extend([line for line in match.groupdict()["elements"].split("\n") if line])
+    return lines
+
+
+def baseline_class(element_class):
+    # Subclass keeping every attribute in a plain slot (properties of watched_fields are replaced by their slots),
+    # so that the regex baseline builds elements as fast as before the grid caches were watched
+    return type(element_class.__name__, (element_class,), {"__slots__": (), **element_slots[element_class]})
+
+
+def regex_path(lines: list, class_name: str) -> int:
+    element_class = baseline_classes[class_name]
+    count = 0
+    for line in lines:
+        for el_match in rgx[class_name].finditer(line):
+            element = element_class()
+            element.load_from_regex_dictionary(el_match.groupdict())
+            count += 1
+    return count
+
+
+baseline_classes = {name: baseline_class(decoder.element_class) for name, decoder in decoders.items()}
+
+
+def decoder_path(lines: list, class_name: str) -> int:
+    decoder = decoders[class_name]
+    count = 0
+    for line in lines:
+        if decoder.decode(line):
+            count += 1
+        else:
+            count += len(list(rgx[class_name].finditer(line)))
+    return count
+
+
+def best_of(function, repeat: int, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(function, *args) -> int:
+    # Peak of memory allocated by python while function runs [B]
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def copied_value(value, intern: bool):
+    # Own copy of a string as read from a file, interned like by the parser if intern is True
+    if type(value) is not str:
+        return value
+    value = (value + " ")[:-1]
+    return sys.intern(value) if intern else value
+
+
+def element_memory(grid: Grid, legacy: bool = False) -> int:
+    # Memory allocated by copies of all elements of the grid with their strings [B]. If legacy is True, elements are dataclasses with an instance
+    # dictionary and every element has its own strings (layout before slots and interning), otherwise they are created by their classes with interned codes
+    names = {element_class: [item.name for item in dataclasses.fields(element_class) if item.init] for element_class in element_values}
+    if legacy:
+        classes = {element_class: dataclasses.make_dataclass(element_class.__name__, [(name, object, dataclasses.field(default=None)) for name in field_names])
+                   for element_class, field_names in names.items()}
+    else:
+        classes = {element_class: element_class for element_class in names}
+    tracemalloc.start()
+    try:
+        copies = []
+        for name in uct_export:
+            for element in getattr(grid, name.lower() + "s").values():
+                element_class = type(element)
+                values = element_values[element_class](element)
+                copies.append(classes[element_class](*[copied_value(value, not legacy and field_name in interned_fields) for field_name, value in zip(names[element_class], values)]))
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def area_views(grid: Grid) -> int:
+    count = 0
+    for area in grid.areas.values():
+        count += len(area.nodes()) + len(area.lines()) + len(area.transformers()) + len(area.tielines()) + len(area.schedules())
+    return count
+
+
+def grid_uct(grid: Grid) -> int:
+    return len(grid.uct())
+
+
+def suite(sizes: list, areas: int, repeat: int) -> list:
+    # Times of parse, export and area/node operations of synthetic models of given numbers of nodes [s]
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            path = os.path.join(folder, file_name())
+            counts = generate(path, size, areas)
+            grid = Grid(path)
+            result = {"nodes": size, "elements": counts, "file_size": os.path.getsize(path)}
+            result["parse"] = best_of(Grid, repeat, path)
+            result["parse_without_text"] = best_of(lambda: Grid(path, keep_text=False), repeat)
+            result["parse_lazy"] = best_of(lambda: Grid(path, lazy=True), repeat)
+            result["parse_peak_memory"] = peak_memory(Grid, path)
+            result["memory_report"] = Grid(path, keep_text=False).memory_report()
+            result["element_memory"] = element_memory(grid)
+            result["element_memory_legacy"] = element_memory(grid, legacy=True)
+            fresh = Grid(path)
+            fresh.uct_cache = True
+            start = time.perf_counter()
+            grid_uct(fresh)
+            result["uct_first"] = time.perf_counter() - start
+            result["uct_cached"] = best_of(grid_uct, repeat, fresh)
+            result["np_xnp"] = best_of(lambda: [(area.np(), area.xnp()) for area in grid.areas.values()], repeat)
+            result["isolated"] = best_of(lambda: [node.isolated() for node in grid.nodes.values()], repeat)
+            result["area_views"] = best_of(area_views, repeat, grid)
+            area = next(iter(grid.areas))
+            result["scenario"] = best_of(lambda: (grid.scale(Node, "pl", 1.01, area=area), grid.net_positions()), repeat)
+            results.append(result)
+            os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regex vs. decoder parse benchmark for uct files, benchmark suite of synthetic models")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", nargs="+", type=int, help="numbers of nodes of synthetic models")
+    parser.add_argument("--areas", type=int, default=5)
+    parser.add_argument("--json", help="file the suite results are written to")
+    args = parser.parse_args()
+    if not args.files and not args.sizes:
+        parser.error("uct files or --sizes are required")
+
+    if args.sizes:
+        results = suite(args.sizes, args.areas, args.repeat)
+        columns = ["parse", "parse_lazy", "uct_first", "uct_cached", "np_xnp", "isolated", "area_views", "scenario"]
+        print(f"{'nodes':>8} {'peak [MB]':>10} {'elements [MB]':>14} {'legacy [MB]':>12} " + " ".join(f"{column + ' [s]':>16}" for column in columns))
+        for result in results:
+            print(f"{result['nodes']:>8} {result['parse_peak_memory'] / 2**20:>10.1f} {result['element_memory'] / 2**20:>14.1f} {result['element_memory_legacy'] / 2**20:>12.1f} "
+                  + " ".join(f"{result[column]:>16.4f}" for column in columns))
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump({"python": platform.python_version(), "platform": platform.platform(), "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                           "areas": args.areas, "repeat": args.repeat, "results": results}, file, indent=2)
+    if not args.files:
+        return
+
+    print(f"{'file':<32} {'element':<12} {'records':>8} {'regex [s]':>10} {'decoder [s]':>12} {'speedup':>8}")
+    for path in args.files:
+        text = open(path).read()
+        for class_name in decoders:
+            lines = section_lines(text, class_name)
+            if not lines:
+                continue
+            records = regex_path(lines, class_name)
+            if decoder_path(lines, class_name) != records:
+                raise Exception(f"Decoder and regex disagree on {class_name} records in {path}")
+            regex_time = best_of(regex_path, args.repeat, lines, class_name)
+            decoder_time = best_of(decoder_path, args.repeat, lines, class_name)
+            print(f"{path[-32:]:<32} {class_name:<12} {records:>8} {regex_time:>10.4f} {decoder_time:>12.4f} {regex_time / decoder_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Writes synthetic uct files of configurable size covering all directive blocks read by uct.py.
+
+Usage: python generate.py <nodes> [<nodes> ...] [--areas N] [--out DIR] [--seed S]
+Files are written to DIR/<nodes>/.
+"""
+import argparse
+import os
+import random
+
+from uct import Node, Line, Transformer, Regulation, Parameter, Schedule, countries, uct_voltage
+
+area_codes = ["DE", "FR", "IT", "PL", "CZ", "SK", "AT", "HU", "SI", "HR", "RS", "RO", "BG", "GR", "ES", "PT", "NL", "BE", "CH", "SE"]
+plant_types = "HNLCGOWF"
+
+
+def node_code(area: str, number: int, voltage: int) -> str:
+    # Country character, 5 base-36 digits, voltage code and bus character
+    digits = ""
+    for _ in range(5):
+        number, digit = divmod(number, 36)
+        digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"[digit] + digits
+    return f"{countries[area]['node']}{digits}{voltage}1"
+
+
+def make_node(code: str, rnd: random.Random, node_type: int = 0) -> Node:
+    node = Node(code=code, name=f"Node {code[1:6]}", status=rnd.choice([0, 0, 0, 1]), node_type=node_type,
+                reference_voltage=float(uct_voltage[int(code[6])]), pl=round(rnd.uniform(0, 150), 2), ql=round(rnd.uniform(-20, 20), 2),
+                pg=0.0, qg=0.0)
+    if node_type in (2, 3):
+        node.pg = round(-rnd.uniform(50, 500), 2)
+        node.qg = round(-rnd.uniform(0, 50), 2)
+        node.pg_min, node.pg_max = 9000.0, -9000.0
+        node.qg_min, node.qg_max = 9999.0, -9999.0
+        if rnd.random() < 0.5:
+            node.static_of_primary_control, node.primary_control_PN = 5.0, 100.0
+            node.sk3, node.x_to_r = 9999.0, 10.0
+            node.plant_type = rnd.choice(plant_types)
+    return node
+
+
+def make_line(node1: str, node2: str, order_code: str, rnd: random.Random, status: int = None) -> Line:
+    return Line(node1=node1, node2=node2, order_code=order_code, status=rnd.choice([0, 0, 0, 0, 0, 0, 1, 2, 8, 9]) if status is None else status,
+                r=round(rnd.uniform(0.1, 5), 4), x=round(rnd.uniform(1, 50), 3), b=round(rnd.uniform(10, 500), 4), i_max=rnd.choice([1000, 2000, 2500, 3150]),
+                name=f"Line {node1[1:4]}-{node2[1:4]}" if rnd.random() < 0.7 else None)
+
+
+def generate(path: str, nodes: int, areas: int = 5, seed: int = 0) -> dict:
+    # Writes a uct file with about *nodes* nodes split into *areas* areas connected by tie-lines over X-nodes, returns numbers of elements
+    rnd = random.Random(seed)
+    areas = area_codes[:max(1, min(areas, len(area_codes)))]
+    per_area = max(2, nodes // len(areas))
+    area_nodes = {area: [] for area in areas}
+    lines, transformers, regulations, parameters = [], [], [], []
+    for area_number, area in enumerate(areas):
+        codes = []
+        for number in range(per_area):
+            voltage = 1 if number % 3 else 2
+            node_type = 3 if area_number == 0 and number == 0 else rnd.choice([0, 0, 0, 2])
+            node = make_node(node_code(area, number, voltage), rnd, node_type)
+            area_nodes[area].append(node)
+            codes.append(node.code)
+        # Spanning tree over nodes of the same voltage level with local meshing, transformers between voltage levels
+        levels = {1: [code for code in codes if code[6] == "1"], 2: [code for code in codes if code[6] == "2"]}
+        for level in levels.values():
+            for position in range(1, len(level)):
+                lines.append(make_line(level[position], level[rnd.randrange(max(0, position - 20), position)], "1", rnd))
+                if rnd.random() < 0.3 and position > 2:
+                    lines.append(make_line(level[position], level[rnd.randrange(max(0, position - 50), position - 1)], "2", rnd))
+        for position in range(0, min(len(levels[1]), len(levels[2])), 4):
+            node1, node2 = levels[1][position], levels[2][position]
+            transformers.append(Transformer(node1=node1, node2=node2, order_code="1", status=rnd.choice([0, 0, 0, 1, 8]), v1=400.0, v2=220.0,
+                                            sn=rnd.choice([250.0, 400.0, 600.0]), r=round(rnd.uniform(0.1, 1), 4), x=round(rnd.uniform(20, 80), 3),
+                                            b=0.0, g=0.0, i_max=rnd.choice([800, 1000, 1500]), name=f"TR {node1[1:6]}" if rnd.random() < 0.5 else None))
+            kind = rnd.random()
+            if kind < 0.6:
+                regulations.append(Regulation(node1=node1, node2=node2, order_code="1", phase_delta_u=1.25, phase_taps=16,
+                                              phase_tap=rnd.randint(0, 16), phase_u=220.0 if rnd.random() < 0.5 else None))
+            elif kind < 0.8:
+                regulations.append(Regulation(node1=node1, node2=node2, order_code="1", angle_delta_u=1.5, angle_phi=rnd.choice([60.0, 90.0]),
+                                              angle_taps=12, angle_tap=rnd.randint(0, 12), angle_p=0.0, angle_type=rnd.choice(["ASYM", "SYMM"])))
+                for tap in range(1, 6):
+                    parameters.append(Parameter(node1=node1, node2=node2, order_code="1", tap=tap, r=0.5, x=round(30 + tap, 3),
+                                                delta_u=round(tap * 1.5, 3), alfa=round(tap * 2.5, 3)))
+    # X-nodes with two half-lines of tie-lines between neighbouring areas
+    xnodes = []
+    for area_number, (area1, area2) in enumerate(zip(areas, areas[1:])):
+        for number in range(max(1, per_area // 500)):
+            code = f"X{countries[area1]['node']}{countries[area2]['node']}{number:03d}11"
+            xnode = Node(code=code, name=f"X {area1}-{area2}", status=0, node_type=0, reference_voltage=400.0,
+                         pl=round(rnd.uniform(-300, 300), 2), ql=0.0, pg=0.0, qg=0.0)
+            xnodes.append(xnode)
+            lines.append(make_line(area_nodes[area1][3 * number + 1].code, code, "1", rnd, status=0))
+            lines.append(make_line(code, area_nodes[area2][3 * number + 1].code, "1", rnd, status=0))
+    schedules = [Schedule(country1=area1, country2=area2, schedule=round(rnd.uniform(-1000, 1000), 2), comments="synthetic" if rnd.random() < 0.5 else None)
+                 for area1, area2 in zip(areas, areas[1:])]
+    with open(path, "w") as file:
+        file.write(f"##C 2007.05.01\nSynthetic model with {sum(map(len, area_nodes.values())) + len(xnodes)} nodes, seed {seed}\n##N\n")
+        for area, elements in [*area_nodes.items(), ("XX", xnodes)]:
+            if elements:
+                file.write(f"##Z{area}\n")
+                file.writelines(element.uct() + "\n" for element in elements)
+        for header, elements in (("L", lines), ("T", transformers), ("R", regulations), ("TT", parameters), ("E", schedules)):
+            file.write(f"##{header}\n")
+            file.writelines(element.uct() + "\n" for element in elements)
+    return {"Node": sum(map(len, area_nodes.values())) + len(xnodes), "Line": len(lines), "Transformer": len(transformers),
+            "Regulation": len(regulations), "Parameter": len(parameters), "Schedule": len(schedules)}
+
+
+def file_name(seed: int = 0) -> str:
+    # Valid uct file name, the hour distinguishes seeds
+    return f"20190206_{seed % 24:02d}30_FO3_UX1.uct"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic uct file generator")
+    parser.add_argument("nodes", nargs="+", type=int)
+    parser.add_argument("--areas", type=int, default=5)
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for nodes in args.nodes:
+        os.makedirs(os.path.join(args.out, str(nodes)), exist_ok=True)
+        path = os.path.join(args.out, str(nodes), file_name(args.seed))
+        counts = generate(path, nodes, args.areas, args.seed)
+        print(path, ", ".join(f"{name}s: {count}" for name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
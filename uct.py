@@ -1,8 +1,24 @@
 import os.path
+import sys
+import importlib
+import io
 import re
+import operator
+import itertools
 import pdb
 import datetime
-from dataclasses import dataclass, field
+import math
+import glob
+import hashlib
+import pickle
+import gc
+import copyreg
+import json
+import mmap
+import bisect
+import time
+import concurrent.futures
+from dataclasses import dataclass, field, fields
 
 class Sub:
     def __init__(self, **kwargs) -> None:
@@ -13,45 +29,104 @@ class Sub:
 
 class Grid:
     __slots__ = ["file","uct_text_original", "name_parts", "comments", "uct_version", "nodes", "lines", "transformers", "regulations", "parameters", "schedules", "areas", "version",
-                "filename", "not_read"]
+                "filename", "not_read", "node_lines", "node_transformers", "area_nodes", "area_schedules", "transformer_parameters", "uct_cache", "lazy", "topology_cache", "load_stats", "select_cache", "np_totals"]
     
     
-    def __init__(self, uct_file_path: str):
+    def __init__(self, uct_file_path: str, keep_text: bool = True, cache: "GridCache" = None, lazy: bool = False, stats: bool = False, hook = None):
+        self.__init_attributes__(uct_file_path)
+        if stats or hook: self.load_stats = LoadStats(self.file, hook)
+        start = time.perf_counter()
+        self.uct_text_original = open(self.file).read() if keep_text else None
+        state = cache.get(self.file, self) if cache else None
+        if state:
+            self.__load_cache_state__(state)
+            if self.load_stats: self.load_stats.loaded(self, "cache", start, 0)
+            return
+        if lazy:
+            self.__scan_sections__()
+            if self.load_stats: self.load_stats.loaded(self, "scan", start, os.path.getsize(self.file))
+            return
+        for record_type in uct_required:
+            self.__init_elements__(record_type)
+        profile = bool(self.load_stats)
+        self.__add_sections__(iter_records(io.StringIO(self.uct_text_original), profile) if keep_text else iter_records(self.file, profile))
+        self.__link_transformers__()
+        if self.load_stats: self.load_stats.loaded(self, "eager", start, os.path.getsize(self.file))
+        if cache: cache.put(self.file, self)
+
+    def __init_attributes__(self, uct_file_path: str):
+        # Attributes of a grid without elements, also used for grids created by merge_grids
         self.file = uct_file_path
         # self.name_parts = self.__get_name_parts__()
         self.filename = Sub(**self.__get_name_parts__())
         # self.date = self.__date__()
-        self.uct_text_original = open(self.file).read()
-        self.uct_version = None #Filled by calling __get_comments__ method.
-        self.comments = self.__get_comments__()
-        self.areas = {}
+        self.uct_text_original = None
+        self.uct_version = None #Filled from ##C sections.
+        self.comments = []
         self.not_read = {}
-        # self.nodes = __get_elements__(self,regex["area"],regex["node"],Node)
-        self.nodes = self.__get_elements__(Node)
-        self.lines = self.__get_elements__(Line)
-        self.regulations = self.__get_elements__(Regulation)
-        # pdb.set_trace()
-        self.parameters = self.__get_elements__(Parameter)
-        self.transformers = self.__get_elements__(Transformer)
-        self.schedules = self.__get_elements__(Schedule)
-        
-        
-        
-        
+        self.uct_cache = False #If True, lines formatted by write_uct are kept in Element.uct_line with the values they were formatted from and reused while the values are the same objects
+        self.lazy = {} #Directive blocks not parsed yet: {record type: [(start, end) byte offsets in the file]}
+        self.topology_cache = None #Topology returned by Grid.topology(), dropped when elements are added or removed or a status of a line or a transformer is set
+        self.select_cache = {} #Indexes built by Grid.select {(element class, criterion): index}, dropped when elements are added or removed, indexes of attributes also when the attribute of an element changes
+        self.load_stats = None #LoadStats of parsing and serialization if enabled by stats or hook
+        self.np_totals = None #{area code: [sum of Node.pg, sum of Node.pl]} built by Grid.net_positions, updated when pg or pl of a node changes, dropped when elements are added or removed
+
+    def __init_elements__(self, record_type: str):
+        # Empty element dictionary, indexes and areas filled by sections of the record type
+        setattr(self, record_type.lower() + "s", Elements(self))
+        for indexed_class, (index, keys) in grid_indexes.items():
+            if indexed_class.__name__ == record_type: setattr(self, index, {})
+        if record_type == "Node": self.areas = {}
+
+    def __scan_sections__(self):
+        # Lazy mode: finds directive blocks of the file without parsing them, only ##C blocks are read right away
+        self.lazy = {record_type: [] for record_type in uct_required}
+        if not os.path.getsize(self.file): return
+        with open(self.file, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            starts = [match.start() for match in rgx["directive_start"].finditer(data)]
+            for start, end in zip(starts, [*starts[1:], len(data)]):
+                header_end = data.find(b"\n", start, end)
+                directive = rgx["directive"].match(data[start:end if header_end < 0 else header_end].decode(errors="replace"))
+                if not directive:
+                    continue
+                if directive.group("comment"):
+                    self.__add_sections__(iter_records(io.TextIOWrapper(io.BytesIO(data[start:end])), bool(self.load_stats)))
+                else:
+                    self.lazy[uct_directives[directive.group("directive") or "Z"]].append((start, end))
+
+    def __load__(self, record_type: str):
+        # Lazy mode: parses directive blocks of one record type recorded by __scan_sections__
+        started = time.perf_counter()
+        blocks = self.lazy.pop(record_type)
+        self.__init_elements__(record_type)
+        if blocks:
+            with open(self.file, "rb") as file:
+                for start, end in blocks:
+                    file.seek(start)
+                    self.__add_sections__(iter_records(io.TextIOWrapper(io.BytesIO(file.read(end - start))), bool(self.load_stats)))
+        if record_type == "Transformer": self.__link_transformers__()
+        if self.load_stats: self.load_stats.loaded(self, record_type, started, sum(end - start for start, end in blocks))
+
+    def load(self) -> "Grid":
+        # Parses all sections that were not accessed yet in lazy mode
+        while self.lazy:
+            self.__load__(next(iter(self.lazy)))
+        return self
+
+    def __getattr__(self, name: str):
+        # Called only for attributes that are not set, in lazy mode these are element dictionaries, their indexes and areas
+        record_type = lazy_attributes.get(name)
+        if record_type and record_type in self.lazy:
+            self.__load__(record_type)
+            return getattr(self, name)
+        raise AttributeError(f"'Grid' object has no attribute '{name}'")
+
     def __get_name_parts__(self):
-        name_rgx_match = rgx["file"].match(os.path.basename(self.file).upper())
-        if not name_rgx_match:
-            raise Exception("File name does not match UCT standard")
-        else:
-            return name_rgx_match.groupdict()
+        return uct_name_parts(self.file)
+
     @property        
     def date(self) -> datetime.datetime:
-        return datetime.datetime(int(self.filename.year),
-                                 int(self.filename.month),
-                                 int(self.filename.day),
-                                 int(self.filename.hour),
-                                 int(self.filename.minute),
-                                 0)
+        return uct_date(self.filename)
 
     @property
     def file_basename(self):
@@ -60,89 +135,846 @@ class Grid:
     def slack(self) -> list:
         return [node for node in self.nodes.values() if node.node_type == 3]
 
-    def __get_comments__(self):
-        # comment_rgx = re.compile(regex["comment"], re.MULTILINE)
-        # comment_rgx_match = comment_rgx.finditer(self.uct_text_original)
-        comment_rgx_match = rgx["comment"].finditer(self.uct_text_original)
-        comments_list = []
-        for match in comment_rgx_match:
-            if match.groupdict()["version"]:
-                self.uct_version = match.groupdict()["version"]
-            comments_list.append(match.groupdict()["text"])
-        return comments_list
-
-    def __get_elements__(self, element_class) -> dict:
-        elements = {}
-        class_name = element_class().__class__.__name__
-        if class_name == "Node":
-            # pdb.set_trace()
-            node_area_codes = {country["node"]: cc for cc, country in countries.items() if country["node"]}
-        for match in rgx[class_name + 's'].finditer(self.uct_text_original):
-            # print(match)
-            # try:
-            # pdb.set_trace()
-            if class_name == "Node":
-                area_code = match.groupdict()["area"]
-                if area_code: self.areas[area_code] = Area(area_code, self)
-            # except:
-            #     pdb.post_mortem()
-            #     area_code = None
-            
-            # print(match.groupdict()["elements"])
-            number_of_elements = len(re.findall("^\S+.*?$", match.groupdict()["elements"], re.MULTILINE))
-            
-            # pdb.set_trace()
-            # print(class_name, number_of_elements)
-            counter = 0
-            for el_match in rgx[class_name].finditer(match.groupdict()["elements"]):
-                element = element_class()
-                element.load_from_regex_dictionary(el_match.groupdict())
-                if class_name == "Node":
-                    if area_code:
-                        element.area = area_code
+    def to_arrays(self) -> "GridArrays":
+        return GridArrays(self)
+
+    def to_arrow(self) -> dict:
+        # {element class name: pyarrow.Table} with columns of snapshot_fields, grid attributes are stored as json in schema metadata of every table
+        pyarrow = import_optional("pyarrow")
+        metadata = {b"uct": json.dumps({"file": self.file, "filename": vars(self.filename), "uct_version": self.uct_version, "comments": self.comments,
+                                        "areas": list(self.areas), "not_read": self.not_read}).encode()}
+        tables = {}
+        for name in uct_export:
+            elements = getattr(self, name.lower() + "s").values()
+            columns = {item.name: item.type for item in fields(globals()[name]) if item.name in snapshot_fields[name]}
+            schema = pyarrow.schema([(column, arrow_types[column_type](pyarrow)) for column, column_type in columns.items()], metadata=metadata)
+            tables[name] = pyarrow.Table.from_pydict({column: [value if value is None else column_type(value) for value in map(operator.attrgetter(column), elements)]
+                                                      for column, column_type in columns.items()}, schema=schema)
+        return tables
+
+    def to_parquet(self, directory: str):
+        # One parquet file per element type named by the element class (Node.parquet, Line.parquet, ...)
+        parquet = import_optional("pyarrow.parquet")
+        os.makedirs(directory, exist_ok=True)
+        for name, table in self.to_arrow().items():
+            parquet.write_table(table, os.path.join(directory, name + ".parquet"))
+
+    @classmethod
+    def from_arrow(cls, tables: dict) -> "Grid":
+        # Grid created from tables of Grid.to_arrow(), Grid.uct() gives the same text as the grid the tables were created from
+        metadata = json.loads(next(iter(tables.values())).schema.metadata[b"uct"])
+        grid_instance = cls.__new__(cls)
+        grid_instance.__init_attributes__(metadata["file"])
+        for record_type in uct_required:
+            grid_instance.__init_elements__(record_type)
+        records = {}
+        for name in snapshot_fields:
+            table = tables.get(name)
+            if table is None or not table.num_rows:
+                records[name] = []
+                continue
+            columns = [table.column(column).to_pylist() if column in table.column_names else [None] * table.num_rows for column in snapshot_fields[name]]
+            columns = [list(map(intern_value, column)) if column_name in interned_fields else column for column_name, column in zip(snapshot_fields[name], columns)]
+            records[name] = list(zip(*columns))
+        grid_instance.__load_snapshot__({"uct_version": metadata["uct_version"], "comments": metadata["comments"], "areas": metadata["areas"],
+                                         "not_read": metadata["not_read"], "elements": records})
+        return grid_instance
+
+    @classmethod
+    def from_parquet(cls, directory: str) -> "Grid":
+        # Files written by Grid.to_parquet are memory mapped while read
+        return cls.from_arrow({name: read_parquet(directory, name) for name in uct_export if os.path.exists(os.path.join(directory, name + ".parquet"))})
+
+    def topology(self) -> "Topology":
+        # Cached until elements are added or removed or a status of a line or a transformer is set (Grid.__changed__, Grid.__edit__)
+        if self.topology_cache is None:
+            self.topology_cache = Topology(self)
+        return self.topology_cache
+
+    def islands(self, without_slack: bool = False) -> list:
+        islands = [{code: self.nodes[code] for code in codes if code in self.nodes} for codes in self.topology().islands]
+        return [island for island in islands if island and not (without_slack and any(node.node_type == 3 for node in island.values()))]
+
+    def component_of(self, node) -> dict:
+        topology = self.topology()
+        return {code: self.nodes[code] for code in topology.islands[topology.island_of(node)] if code in self.nodes}
+
+    def select(self, element_class, **criteria) -> dict:
+        # Elements of the class matching all criteria {name: value, list or set of values or function returning True for matching value},
+        # criteria of select_indexes and prefix of ids are looked up in indexes, other criteria are checked only on elements found in the indexes
+        elements = getattr(self, element_class.__name__.lower() + "s")
+        indexes = select_indexes.get(element_class, {})
+        buckets, checks = [], []
+        for name, value in criteria.items():
+            if name == "areas" and type(value) == tuple:
+                value = tuple(sorted(value)) #Areas of a branch are indexed in alphabetical order
+            if name == "prefix":
+                buckets.append(self.__prefix_bucket__(element_class, elements, value))
+            elif name == "id":
+                buckets.append({key: elements[key] for key in ([value] if isinstance(value, str) else value) if key in elements})
+            elif name in indexes and not callable(value):
+                index = self.__select_index__(element_class, elements, name)
+                if type(value) in (list, set):
+                    bucket = {}
+                    for item in value:
+                        bucket.update(index.get(item, {}))
+                else:
+                    bucket = index.get(value, {})
+                buckets.append(bucket)
+            else:
+                key = indexes.get(name)
+                if isinstance(key, str):
+                    raise Exception(f"Criterion {name} of Grid.select can't be a function")
+                checks.append((operator.attrgetter(name) if key is None else (lambda element, key=key: key(self, element)), value))
+        buckets.sort(key=len)
+        selected = dict(buckets[0] if buckets else elements)
+        for bucket in buckets[1:]:
+            selected = {key: element for key, element in selected.items() if key in bucket}
+        for value, criterion in checks:
+            selected = {key: element for key, element in selected.items() if select_matches(value(element), criterion)}
+        return selected
+
+    def __select_index__(self, element_class, elements: dict, name: str) -> dict:
+        # {value: {id: element}} built on first use, index of an attribute is dropped by Grid.__changed__ when the attribute of an element of the grid changes
+        key = select_indexes[element_class][name]
+        if isinstance(key, str):
+            return getattr(self, key)
+        index = self.select_cache.get((element_class, name))
+        if index is not None:
+            return index
+        index = {}
+        values = map(operator.attrgetter(name), elements.values()) if key is None else [key(self, element) for element in elements.values()]
+        for (element_id, element), value in zip(elements.items(), values):
+            if value in index:
+                index[value][element_id] = element
+            else:
+                index[value] = {element_id: element}
+        self.select_cache[(element_class, name)] = index
+        return index
+
+    def __prefix_bucket__(self, element_class, elements: dict, prefix: str) -> dict:
+        # Elements with id starting with the prefix found by bisection of sorted ids
+        ids = self.select_cache.get((element_class, "prefix"))
+        if ids is None:
+            ids = self.select_cache[(element_class, "prefix")] = sorted(elements)
+        start = bisect.bisect_left(ids, prefix)
+        end = bisect.bisect_left(ids, prefix + "\uffff", start)
+        return {element_id: elements[element_id] for element_id in ids[start:end]}
+
+    def __area_branches__(self, element_class) -> dict:
+        # {area code: {id: branch}} of branches with a node in the area in the order of the grid dictionary, built on first use
+        index = self.select_cache.get((element_class, "area"))
+        if index is not None:
+            return index
+        index = {}
+        nodes = self.nodes
+        for key, element in getattr(self, element_class.__name__.lower() + "s").items():
+            for code in (element.node1, element.node2):
+                if code in nodes:
+                    area = nodes[code].area
+                    if area in index:
+                        index[area][key] = element
                     else:
-                        element.area = node_area_codes[element.code[0]]
-                        if element.area not in self.areas:
-                            # print(f"adding area {element.area}")
-                            self.areas[element.area] = Area(element.area, self)
-                if class_name == "Transformer" and element.id in self.regulations:
-                    element.regulation = self.regulations[element.id]
-                    if element.id in [parameter.transformer_id for parameter in self.parameters.values()]: element.parameters.extend([parameter for parameter in self.parameters.values() if parameter.transformer_id == element.id])
-                element.grid = self
-                elements[element.id] = element
-                counter += 1
-
-            if counter != number_of_elements:
-                notadd = [line for line in match.groupdict()["elements"].split("\n") if line and not rgx[class_name].match(line)]
-                if notadd:
-                    # pdb.set_trace()
-                    if class_name not in self.not_read: self.not_read[class_name] = []
-                    self.not_read[class_name] = [*self.not_read[class_name], *notadd]
-
-                # print(notadd)
-                # print("Not added:",class_name, number_of_elements-counter)
+                        index[area] = {key: element}
+        self.select_cache[(element_class, "area")] = index
+        return index
+
+    def scale(self, element_class, attributes, factor: float = 1.0, shift: float = 0.0, **criteria) -> dict:
+        # value * factor + shift for attributes of elements selected by Grid.select(element_class, **criteria), missing values are left None
+        function = lambda value: None if value is None else value * factor + shift
+        return self.__edit__(element_class, {name: function for name in ([attributes] if isinstance(attributes, str) else attributes)}, criteria)
+
+    def assign(self, element_class, values: dict, **criteria) -> dict:
+        # Sets {attribute: value} on all elements selected by Grid.select(element_class, **criteria), e.g. statuses of branches
+        return self.__edit__(element_class, {name: (lambda old_value, value=value: value) for name, value in values.items()}, criteria)
+
+    def __changed__(self, element, name: str, value):
+        # Called by properties of watched_fields before the attribute of an element of the grid is set
+        self.select_cache.pop((type(element), name), None)
+        if name == "status" and type(element) is not Node: self.topology_cache = None
+        if name in ("pg", "pl") and self.np_totals is not None and type(element) is Node and self.nodes.get(element.code) is element:
+            self.np_totals[element.area][("pg", "pl").index(name)] += number_or_zero(value) - number_or_zero(getattr(element, name))
+
+    def __edit__(self, element_class, functions: dict, criteria: dict) -> dict:
+        # New values {attribute: function(old value)} written to selected elements in one pass over every attribute directly to their slots (element_slots),
+        # caches are updated once for all elements: totals of net positions are moved by differences of pg and pl
+        for name in functions:
+            if name in key_fields:
+                raise Exception(f"{name} is a part of ids or grid indexes, replace the elements instead of editing {element_class.__name__}.{name}")
+            if name not in snapshot_fields[element_class.__name__]:
+                raise Exception(f"{element_class.__name__} has no attribute {name}")
+        elements = self.select(element_class, **criteria)
+        totals = self.np_totals if element_class is Node else None
+        for name, function in functions.items():
+            old_values = list(map(operator.attrgetter(name), elements.values()))
+            values = list(map(function, old_values))
+            if totals is not None and name in ("pg", "pl"):
+                column = ("pg", "pl").index(name)
+                if isinstance(criteria.get("area"), str) and criteria["area"] in totals:
+                    totals[criteria["area"]][column] += sum(filter(None, values)) - sum(filter(None, old_values))
+                else:
+                    for area, value, old_value in zip(map(operator.attrgetter("area"), elements.values()), values, old_values):
+                        totals[area][column] += (value or 0.0) - (old_value or 0.0)
+            write = element_slots[element_class][name].__set__
+            for element, value in zip(elements.values(), values):
+                write(element, value)
+            if name in watched_fields.get(element_class, ()): self.select_cache.pop((element_class, name), None)
+            if name == "status" and element_class in (Line, Transformer): self.topology_cache = None
         return elements
-    
+
+    def net_positions(self) -> dict:
+        # {area code: net position} same as Area.np() of every area, computed from sums kept in Grid.np_totals
+        if self.np_totals is None:
+            self.np_totals = {area: [sum(map(number_or_zero, map(operator.attrgetter("pg"), nodes.values()))), sum(map(number_or_zero, map(operator.attrgetter("pl"), nodes.values())))]
+                              for area, nodes in self.area_nodes.items()}
+        return {area: -generation - load for area, (generation, load) in self.np_totals.items()}
+
+    def power_flow(self, slack: list = None) -> "PowerFlow":
+        return PowerFlow(self, slack)
+
+    def memory_report(self) -> dict:
+        # Approximate memory held by the grid [B] by element class name, grid dictionaries (with their indexes), uct text and uct cache,
+        # objects shared by more elements (interned codes, ids used as keys) are counted once
+        seen = {id(self)}
+        def size(value) -> int:
+            if id(value) in seen or value is None:
+                return 0
+            seen.add(id(value))
+            total = sys.getsizeof(value)
+            if type(value) in (tuple, list):
+                total += sum(map(size, value))
+            return total
+        report = {}
+        for name in uct_export:
+            elements = getattr(self, name.lower() + "s")
+            total = 0
+            for element in elements.values():
+                total += size(element)
+                if hasattr(element, "__dict__"):
+                    total += size(element.__dict__) + sum(map(size, element.__dict__.values()))
+                else:
+                    total += sum(size(getattr(element, slot)) for cls in type(element).__mro__ for slot in getattr(cls, "__slots__", []) if slot not in ["grid", "uct_line"])
+            report[name] = total
+        dictionaries = [getattr(self, name.lower() + "s") for name in uct_export] + [getattr(self, index) for index, keys in grid_indexes.values()]
+        report["dictionaries"] = sum(size(dictionary) + sum(map(size, dictionary)) + sum(size(inner) + sum(map(size, inner)) for inner in dictionary.values() if type(inner) == dict)
+                                     for dictionary in dictionaries)
+        report["text"] = size(self.uct_text_original)
+        report["uct_cache"] = sum(size(element.uct_line) for name in uct_export for element in getattr(self, name.lower() + "s").values())
+        report["total"] = sum(report.values())
+        return report
+
+    def __add_sections__(self, sections):
+        if self.load_stats:
+            self.load_stats.add_sections(self, sections)
+            return
+        for section in sections:
+            self.__add_section__(section)
+
+    def __add_section__(self, section):
+        if section.record_type == "Comment":
+            if section.version:
+                self.uct_version = section.version
+            self.comments.append(section.text)
+            return
+        if section.record_type == "Node":
+            if section.area: self.areas[section.area] = Area(section.area, self)
+            node_area_codes = {country["node"]: cc for cc, country in countries.items() if country["node"]}
+        for element in section.records:
+            if section.record_type == "Node":
+                if section.area:
+                    element.area = section.area
+                else:
+                    element.area = node_area_codes[element.code[0]]
+                    if element.area not in self.areas:
+                        self.areas[element.area] = Area(element.area, self)
+            element.grid = self
+        self.__add_elements__(getattr(self, section.record_type.lower() + "s"), section.records)
+        if section.not_read:
+            if section.record_type not in self.not_read: self.not_read[section.record_type] = []
+            self.not_read[section.record_type] = [*self.not_read[section.record_type], *section.not_read]
+
+    def __link_transformers__(self):
+        for element in self.transformers.values():
+            if element.id in self.regulations:
+                element.regulation = self.regulations[element.id]
+                element.parameters.extend(self.parameters_for(element.id))
+
+    def __cache_state__(self) -> dict:
+        # Parsed content of the grid stored by GridCache, element dictionaries and indexes are stored as they are, so nothing is rebuilt on load
+        return {name: getattr(self, name) for name in cached_attributes}
+
+    def __load_cache_state__(self, state: dict):
+        # Elements are stored by GridCache without grid (cached_element)
+        for name, value in state.items():
+            setattr(self, name, value)
+        for name in uct_export:
+            for element in getattr(self, name.lower() + "s").values():
+                element.grid = self
+
+    def __load_snapshot__(self, snapshot: dict):
+        # Grid content in plain tuples of snapshot_fields (used by Grid.from_arrow)
+        self.uct_version = snapshot["uct_version"]
+        self.comments = snapshot["comments"]
+        self.not_read = snapshot["not_read"]
+        for area_code in snapshot["areas"]:
+            self.areas[area_code] = Area(area_code, self)
+        for name, records in snapshot["elements"].items():
+            element_class = globals()[name]
+            elements = [element_class(*values) for values in records]
+            for element in elements:
+                element.grid = self
+            self.__add_elements__(getattr(self, name.lower() + "s"), elements)
+        self.__link_transformers__()
+
+    def parameters_for(self, transformer_id: str) -> list:
+        return list(self.transformer_parameters.get(transformer_id, {}).values())
+
+    def __indexes__(self, element_class) -> list:
+        # (index, function returning keys of an element in the index) for every Grid index of the element class
+        return [(getattr(self, index), keys) for indexed_class, (index, keys) in grid_indexes.items() if issubclass(element_class, indexed_class)]
+
+    def __index_keys__(self, element) -> list:
+        # (index, keys under which the element is stored in the index) for every Grid index the element belongs to
+        return [(index, set(keys(element))) for index, keys in self.__indexes__(type(element))]
+
+    def __add_elements__(self, elements: "Elements", new_elements: list):
+        # Bulk insertion used while loading, same result as elements[element.id] = element for every element
+        self.topology_cache = None
+        self.select_cache = {}
+        self.np_totals = None
+        indexes = self.__indexes__(type(new_elements[0])) if new_elements else []
+        for element in new_elements:
+            key = element.id
+            if key in elements:
+                elements[key] = element
+                continue
+            dict.__setitem__(elements, key, element)
+            for index, keys in indexes:
+                for index_key in keys(element):
+                    if index_key in index:
+                        index[index_key][key] = element
+                    else:
+                        index[index_key] = {key: element}
+
+    def __index_element__(self, key: str, element):
+        if element.grid is None: element.grid = self
+        self.topology_cache = None
+        self.select_cache = {}
+        self.np_totals = None
+        for index, index_keys in self.__index_keys__(element):
+            for index_key in index_keys:
+                if index_key not in index: index[index_key] = {}
+                index[index_key][key] = element
+
+    def __unindex_element__(self, key: str, element, replacement = None):
+        # Keys shared with the replacement are left in place, so the element keeps its position in the index like in the grid dictionary
+        self.topology_cache = None
+        self.select_cache = {}
+        self.np_totals = None
+        indexes = self.__index_keys__(element)
+        kept = [index_keys for index, index_keys in self.__index_keys__(replacement)] if type(replacement) == type(element) else [set()] * len(indexes)
+        for (index, index_keys), kept_keys in zip(indexes, kept):
+            for index_key in index_keys - kept_keys:
+                if index_key in index:
+                    index[index_key].pop(key, None)
+                    if not index[index_key]: del index[index_key]
+
     def __repr__(self) -> str:
         return "Grid(%s)" %"; ".join([f"{ky + 's'}: {len(getattr(self,ky.lower() + 's'))}" for ky in uct_export])
     
     def uct(self, trim: bool = False, C: bool = True, N: bool = True, L: bool = True, T: bool = True, E: bool = True) -> str:
-        output = ""
+        output = io.StringIO()
+        self.write_uct(output, trim, C, N, L, T, E)
+        return output.getvalue()
+
+    def write_uct(self, file, trim: bool = False, C: bool = True, N: bool = True, L: bool = True, T: bool = True, E: bool = True):
+        # Writes the same text as Grid.uct() to an open text file, lines of unchanged elements are reused from Element.uct_line if Grid.uct_cache is True
+        if self.load_stats:
+            self.load_stats.write_uct(self, file, trim, C, N, L, T, E)
+        else:
+            self.__write_uct__(file, trim, C, N, L, T, E)
+
+    def __write_uct__(self, file, trim: bool, C: bool, N: bool, L: bool, T: bool, E: bool):
         if C:
-            output = f"##C {self.uct_version}\n" + "\n".join(self.comments)
+            file.write(f"##C {self.uct_version}\n" + "\n".join(self.comments))
         if N:
-            output = output + "##N\n" + "".join([area.uct(trim) for area in self.areas.values()])
+            file.write("##N\n")
+            for area in self.areas.values():
+                area.write_uct(file, trim)
         if L:
-            output = output + "##L\n" + "\n".join([item.uct(trim) for item in self.lines.values()]) + "\n"
+            self.__write_block__(file, "##L\n", self.lines.values(), trim)
         if T:
-            output = output + "##T\n" + "\n".join([item.uct(trim) for item in self.transformers.values()]) + "\n"
-            if self.regulations: output = output + "##R\n" + "\n".join([item.uct(trim) for item in self.regulations.values()]) + "\n"
-            # pdb.set_trace()
-            if self.parameters: output = output + "##TT\n" + "\n".join([item.uct(trim) for item in self.parameters.values()]) + "\n"
+            self.__write_block__(file, "##T\n", self.transformers.values(), trim)
+            if self.regulations: self.__write_block__(file, "##R\n", self.regulations.values(), trim)
+            if self.parameters: self.__write_block__(file, "##TT\n", self.parameters.values(), trim)
         if E and self.schedules:
-            output = output = output + "##E\n" + "\n".join([item.uct(trim) for item in self.schedules.values()]) + "\n"
+            self.__write_block__(file, "##E\n", self.schedules.values(), trim)
+
+    def clear_uct_cache(self):
+        # Drops lines kept in Element.uct_line of all elements
+        for name in uct_export:
+            for element in getattr(self, name.lower() + "s").values():
+                element.uct_line = None
 
-        return output
+    def __write_block__(self, file, header: str, elements, trim: bool):
+        file.write(header)
+        empty = True
+        for element in elements:
+            file.write(uct_formatters[element.__class__.__name__].format(element, trim, self.uct_cache) + "\n")
+            empty = False
+        if empty: file.write("\n")
+
+class GridCache:
+    # On-disk cache of parsed grids. Entries are keyed by file path, size and modification time (or by file content if content_hash is True),
+    # least recently used entries are removed when the cache directory grows over max_bytes. Stale or corrupt entries are ignored and the file is parsed.
+    __slots__ = ["directory", "max_bytes", "content_hash"]
+
+    def __init__(self, directory: str, max_bytes: int = 2**30, content_hash: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, uct_file_path: str) -> str:
+        digest = hashlib.sha1(f"{grid_cache_version}".encode())
+        if self.content_hash:
+            with open(uct_file_path, "rb") as file:
+                for chunk in iter(lambda: file.read(2**20), b""):
+                    digest.update(chunk)
+        else:
+            stat = os.stat(uct_file_path)
+            digest.update(f"{os.path.abspath(uct_file_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    def entry(self, uct_file_path: str) -> str:
+        return os.path.join(self.directory, self.key(uct_file_path) + ".grid")
+
+    def get(self, uct_file_path: str, grid_instance: Grid) -> dict:
+        # State of the grid {attribute: value} for Grid.__load_cache_state__, references to the cached grid are resolved to grid_instance
+        entry = self.entry(uct_file_path)
+        try:
+            with open(entry, "rb") as file:
+                unpickler = pickle.Unpickler(file)
+                unpickler.persistent_load = lambda persistent_id: grid_instance
+                collecting = gc.isenabled()
+                gc.disable() #Collections triggered by the allocation of elements double the loading time and find nothing to free
+                try:
+                    version, state = unpickler.load()
+                finally:
+                    if collecting: gc.enable()
+            if version != grid_cache_version:
+                raise Exception("Stale grid cache entry")
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.remove(entry)
+            return None
+        os.utime(entry)
+        return state
+
+    def put(self, uct_file_path: str, grid_instance: Grid):
+        entry = self.entry(uct_file_path)
+        temporary = f"{entry}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                pickler = pickle.Pickler(file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickler.persistent_id = lambda obj: "grid" if obj is grid_instance else None
+                pickler.dispatch_table = {**copyreg.dispatch_table, **{element_class: cached_element for element_class in element_values}}
+                pickler.dump((grid_cache_version, grid_instance.__cache_state__()))
+            os.replace(temporary, entry)
+        except OSError:
+            self.remove(temporary)
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".grid"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        size = sum(entry[1] for entry in entries)
+        for modified, entry_size, entry in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            self.remove(entry)
+            size -= entry_size
+
+    def remove(self, entry: str):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".grid"): self.remove(os.path.join(self.directory, name))
+
+    def __repr__(self) -> str:
+        return f"GridCache({self.directory!r}, max_bytes={self.max_bytes}, content_hash={self.content_hash})"
+
+class LoadStats:
+    # Instrumentation of parsing and serialization of a grid enabled by Grid(stats=True) or Grid(hook=callable).
+    # hook(event, grid, data) is called with event "section" after every parsed directive block, "load" after the file (or a lazy record type) is parsed and "uct" after Grid.write_uct.
+    __slots__ = ["file", "hook", "sections", "loads", "serializations"]
+
+    def __init__(self, uct_file_path: str, hook = None):
+        self.file = uct_file_path
+        self.hook = hook
+        self.sections = [] #Sub(record_type, area, parse_time, add_time, characters, records, not_read, fallbacks, failed_conversions, none_fields) of every directive block
+        self.loads = [] #Sub(mode, time, bytes), mode is eager, cache, scan or the record type parsed in lazy mode
+        self.serializations = [] #Sub(time, bytes, elements, trim) of every Grid.write_uct or Grid.uct call
+
+    def add_sections(self, grid_instance: Grid, sections):
+        # Adds sections to the grid measuring time spent in the parser (parse_time) and in Grid.__add_section__ (add_time)
+        start = time.perf_counter()
+        for section in sections:
+            parsed = time.perf_counter()
+            grid_instance.__add_section__(section)
+            added = time.perf_counter()
+            self.section(grid_instance, section, parsed - start, added - parsed)
+            start = time.perf_counter()
+
+    def section(self, grid_instance: Grid, section: "Section", parse_time: float, add_time: float):
+        records = section.records
+        none_fields = {}
+        if section.record_type != "Comment":
+            # Numbers of None values of every field (blank fields and values that could not be converted)
+            for name in uct_export[section.record_type]:
+                count = operator.countOf(map(operator.attrgetter(name), records), None)
+                if count: none_fields[name] = count
+        data = Sub(record_type=section.record_type, area=section.area, parse_time=parse_time, add_time=add_time, characters=section.characters, records=len(records),
+                   not_read=len(section.not_read), fallbacks=section.fallbacks, failed_conversions=section.failed_conversions, none_fields=none_fields)
+        self.sections.append(data)
+        if self.hook: self.hook("section", grid_instance, data)
+
+    def loaded(self, grid_instance: Grid, mode: str, start: float, bytes: int):
+        data = Sub(mode=mode, time=time.perf_counter() - start, bytes=bytes)
+        self.loads.append(data)
+        if self.hook: self.hook("load", grid_instance, data)
+
+    def write_uct(self, grid_instance: Grid, file, trim: bool, C: bool, N: bool, L: bool, T: bool, E: bool):
+        try:
+            position = file.tell()
+        except (AttributeError, OSError, ValueError):
+            position = None
+        start = time.perf_counter()
+        grid_instance.__write_uct__(file, trim, C, N, L, T, E)
+        elapsed = time.perf_counter() - start
+        elements = sum(len(getattr(grid_instance, name.lower() + "s")) for name, write in zip(uct_export, [N, L, T, T, T, E]) if write)
+        data = Sub(time=elapsed, bytes=file.tell() - position if position is not None else None, elements=elements, trim=trim)
+        self.serializations.append(data)
+        if self.hook: self.hook("uct", grid_instance, data)
+
+    @property
+    def time(self) -> float:
+        return sum(load.time for load in self.loads)
+
+    @property
+    def characters(self) -> int:
+        return sum(section.characters for section in self.sections)
+
+    @property
+    def fallbacks(self) -> int:
+        return sum(section.fallbacks for section in self.sections)
+
+    @property
+    def failed_conversions(self) -> int:
+        return sum(sum(section.failed_conversions.values()) for section in self.sections)
+
+    def counts(self) -> dict:
+        # {record type: number of parsed records}
+        counts = {}
+        for section in self.sections:
+            if section.record_type != "Comment": counts[section.record_type] = counts.get(section.record_type, 0) + section.records
+        return counts
+
+    def none_fields(self) -> dict:
+        # {record type: {field name: number of records with None value}}
+        return self.__by_field__("none_fields")
+
+    def failed_fields(self) -> dict:
+        # {record type: {field name: number of records with a value that could not be converted}}
+        return self.__by_field__("failed_conversions")
+
+    def __by_field__(self, attribute: str) -> dict:
+        totals = {}
+        for section in self.sections:
+            for name, count in getattr(section, attribute).items():
+                record_fields = totals.setdefault(section.record_type, {})
+                record_fields[name] = record_fields.get(name, 0) + count
+        return totals
+
+    def __repr__(self) -> str:
+        return (f"LoadStats(Time: {self.time:.4f} s; Sections: {len(self.sections)}; Characters: {self.characters}; Records: {sum(self.counts().values())}; "
+                f"Fallbacks: {self.fallbacks}; Failed conversions: {self.failed_conversions}; Serializations: {len(self.serializations)})")
+
+def uct_name_parts(uct_file_path: str) -> dict:
+    name_rgx_match = rgx["file"].match(os.path.basename(uct_file_path).upper())
+    if not name_rgx_match:
+        raise Exception("File name does not match UCT standard")
+    else:
+        return name_rgx_match.groupdict()
+
+def uct_date(filename: Sub) -> datetime.datetime:
+    return datetime.datetime(int(filename.year),
+                             int(filename.month),
+                             int(filename.day),
+                             int(filename.hour),
+                             int(filename.minute),
+                             0)
+
+class GridCollection:
+    # uct files indexed by date, area and type from their names. Grids are parsed on first access (or in parallel by load)
+    # and at most max_grids of them are kept in memory, least recently used are dropped and parsed again when needed.
+    __slots__ = ["files", "by_date", "by_area", "by_type", "grids", "max_grids", "keep_text", "cache", "lazy_sections"]
+
+    def __init__(self, uct_files, max_grids: int = None, keep_text: bool = True, cache: GridCache = None, lazy_sections: bool = False):
+        if isinstance(uct_files, str):
+            uct_files = glob.glob(uct_files)
+        self.max_grids = max_grids
+        self.keep_text = keep_text
+        self.cache = cache
+        self.lazy_sections = lazy_sections
+        self.grids = {}
+        self.files = {}
+        self.by_date = {}
+        self.by_area = {}
+        self.by_type = {}
+        for path in uct_files:
+            filename = Sub(**uct_name_parts(path))
+            self.files[path] = filename
+            for index, key in ((self.by_date, uct_date(filename)), (self.by_area, filename.area), (self.by_type, filename.type)):
+                if key not in index: index[key] = []
+                index[key].append(path)
+
+    def select(self, date: datetime.datetime = None, area: str = None, type: str = None) -> list:
+        # Paths of files matching all given criteria ordered by date
+        paths = set(self.files)
+        for index, key in ((self.by_date, date), (self.by_area, area), (self.by_type, type)):
+            if key is not None:
+                paths.intersection_update(index.get(key, []))
+        return sorted(paths, key=lambda path: (uct_date(self.files[path]), path))
+
+    def grid(self, uct_file_path: str) -> Grid:
+        if uct_file_path in self.grids:
+            grid = self.grids.pop(uct_file_path)
+        elif uct_file_path in self.files:
+            grid = Grid(uct_file_path, self.keep_text, self.cache, self.lazy_sections)
+        else:
+            raise KeyError(uct_file_path)
+        self.__store__(uct_file_path, grid)
+        return grid
+
+    def grids_for(self, date: datetime.datetime = None, area: str = None, type: str = None):
+        for path in self.select(date, area, type):
+            yield self.grid(path)
+
+    def load(self, workers: int = None, date: datetime.datetime = None, area: str = None, type: str = None):
+        # Parses selected files that are not in memory yet in a pool of worker processes
+        paths = [path for path in self.select(date, area, type) if path not in self.grids]
+        if self.max_grids is not None:
+            paths = paths[-self.max_grids:]
+        if workers == 1 or len(paths) < 2:
+            grids = map(Grid, paths, [self.keep_text] * len(paths), [self.cache] * len(paths), [self.lazy_sections] * len(paths))
+            for path, grid in zip(paths, grids):
+                self.__store__(path, grid)
+            return self
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for path, grid in zip(paths, executor.map(Grid, paths, [self.keep_text] * len(paths), [self.cache] * len(paths), [self.lazy_sections] * len(paths))):
+                self.__store__(path, grid)
+        return self
+
+    def merge(self, mode: str = "UX", workers: int = None, date: datetime.datetime = None, type: str = None, ignore_conflicts: bool = False) -> dict:
+        # Merges files of individual areas for every date and type, timestamps are merged in a pool of worker processes if workers is not 1
+        groups = {}
+        for path in self.select(date, None, type):
+            filename = self.files[path]
+            if filename.area in ["UX", "UC"]:
+                continue
+            key = (uct_date(filename), filename.type)
+            if key not in groups: groups[key] = []
+            groups[key].append(path)
+        groups = list(groups.values())
+        if workers == 1 or len(groups) < 2:
+            merged = [merge_grids([self.grid(path) for path in paths], mode, ignore_conflicts=ignore_conflicts) for paths in groups]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                merged = list(executor.map(merge_files, groups, [mode] * len(groups), [None] * len(groups), [ignore_conflicts] * len(groups), [self.cache] * len(groups)))
+        return {grid.file: grid for grid in merged}
+
+    def __store__(self, uct_file_path: str, grid: Grid):
+        self.grids[uct_file_path] = grid
+        while self.max_grids is not None and len(self.grids) > self.max_grids:
+            del self.grids[next(iter(self.grids))]
+
+    def __getitem__(self, uct_file_path: str) -> Grid:
+        return self.grid(uct_file_path)
+
+    def __iter__(self):
+        return iter(self.select())
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __repr__(self) -> str:
+        return f"GridCollection(Files: {len(self.files)}; Loaded: {len(self.grids)}; Dates: {len(self.by_date)}; Areas: {', '.join(self.by_area)})"
+
+def load_many(uct_files, workers: int = None, max_grids: int = None, keep_text: bool = True, lazy: bool = False, cache: GridCache = None, lazy_sections: bool = False) -> GridCollection:
+    collection = GridCollection(uct_files, max_grids, keep_text, cache, lazy_sections)
+    return collection if lazy else collection.load(workers)
+
+def cached_element(element) -> tuple:
+    # Reduction of elements stored by GridCache: element created by its class (the grid is set by Grid.__load_cache_state__)
+    return (type(element), element_values[type(element)](element))
+
+def read_parquet(directory: str, element_class, columns: list = None, filters: list = None):
+    # pyarrow.Table of an element type written by Grid.to_parquet, the file is memory mapped and only selected columns and rows matching filters are read
+    parquet = import_optional("pyarrow.parquet")
+    name = element_class if isinstance(element_class, str) else element_class.__name__
+    return parquet.read_table(os.path.join(directory, name + ".parquet"), columns=columns, filters=filters, memory_map=True)
+
+def merged_file_path(uct_file_path: str, mode: str) -> str:
+    # Path of a merged dataset (UX or UC) in the folder of the uct file for the same date, type and version
+    name = Sub(**uct_name_parts(uct_file_path))
+    return os.path.join(os.path.dirname(uct_file_path), f"{name.year}{name.month}{name.day}_{name.hour}{name.minute}_{name.type}{name.week_day}_{mode}{name.version}.uct")
+
+def merge_grids(grids: list, mode: str = "UX", uct_file_path: str = None, ignore_conflicts: bool = False) -> Grid:
+    # Merges grids of individual areas into one grid in a single pass over their elements. X-nodes shared by the grids are kept once (UX)
+    # or, if they connect exactly two half-lines from different grids, removed and both halves are joined into one line (UC).
+    if mode not in ["UX", "UC"]:
+        raise Exception(f"Merge mode has to be UX or UC, not {mode}")
+    if not grids:
+        raise Exception("No grids to merge")
+    elements = {name: {} for name in uct_required}
+    xnode_lines = {} #{X-node code: {Line.id: (grid number, Line)}}
+    conflicts = []
+    for number, grid in enumerate(grids):
+        xnodes = grid.area_nodes.get("XX", {})
+        for name in uct_required:
+            merged_elements = elements[name]
+            for key, element in getattr(grid, name.lower() + "s").items():
+                if name == "Line":
+                    for code in (element.node1, element.node2):
+                        if code in xnodes:
+                            if code not in xnode_lines: xnode_lines[code] = {}
+                            xnode_lines[code][key] = (number, element)
+                if key not in merged_elements:
+                    merged_elements[key] = element
+                elif merged_elements[key] != element and not (name == "Node" and key in xnodes):
+                    conflicts.append(f"{name} '{key}'")
+    # Half-lines from two grids meet in the X-node
+    paired = {code: list(lines.values()) for code, lines in xnode_lines.items() if len(lines) == 2 and len({number for number, line in lines.values()}) == 2}
+    if mode == "UC":
+        for code, ((number1, line1), (number2, line2)) in paired.items():
+            del elements["Node"][code]
+            del elements["Line"][line1.id]
+            del elements["Line"][line2.id]
+        for code, ((number1, line1), (number2, line2)) in paired.items():
+            line = join_half_lines(code, line1, line2)
+            if line.id in elements["Line"]:
+                conflicts.append(f"Line '{line.id}'")
+            else:
+                elements["Line"][line.id] = line
+    if conflicts and not ignore_conflicts:
+        raise Exception(f"Conflicting elements in merged grids: {', '.join(conflicts)}")
+    merged = Grid.__new__(Grid)
+    merged.__init_attributes__(uct_file_path or merged_file_path(grids[0].file, mode))
+    merged.uct_version = grids[0].uct_version
+    comments = [comment for grid in grids for comment in grid.comments]
+    merged.comments = ["".join(comments)] if comments else []
+    for grid in grids:
+        for name, lines in grid.not_read.items():
+            merged.not_read[name] = [*merged.not_read.get(name, []), *lines]
+    for name in uct_required:
+        merged.__init_elements__(name)
+        element_class = globals()[name]
+        values = operator.attrgetter(*snapshot_fields[name])
+        copies = [element_class(*values(element)) for element in elements[name].values()]
+        if name == "Node":
+            # Injections of paired X-nodes are replaced by the tie-lines connected to them
+            for node in copies:
+                if node.code in paired: node.pl, node.ql, node.pg, node.qg = 0.0, 0.0, 0.0, 0.0
+            area_codes = {node.area for node in copies}
+            for code in [code for grid in grids for code in grid.areas] + sorted(area_codes):
+                if code in area_codes and code not in merged.areas: merged.areas[code] = Area(code, merged)
+        for element in copies:
+            element.grid = merged
+        merged.__add_elements__(getattr(merged, name.lower() + "s"), copies)
+    merged.__link_transformers__()
+    return merged
+
+def join_half_lines(xnode_code: str, line1: "Line", line2: "Line") -> "Line":
+    # One line between inner nodes of two half-lines connected in the X-node, in operation only if both halves are
+    node1 = line1.node2 if line1.node1 == xnode_code else line1.node1
+    node2 = line2.node2 if line2.node1 == xnode_code else line2.node1
+    in_operation = line1.status in [0, 1, 2] and line2.status in [0, 1, 2]
+    status_classes = {line_status_classes.get(line.status, (0, 8)) for line in (line1, line2)}
+    in_service, out_of_service = status_classes.pop() if len(status_classes) == 1 else (0, 8)
+    limits = [line.i_max for line in (line1, line2) if line.i_max is not None]
+    return Line(node1, node2, line1.order_code, in_service if in_operation else out_of_service, number_or_zero(line1.r) + number_or_zero(line2.r),
+                number_or_zero(line1.x) + number_or_zero(line2.x), number_or_zero(line1.b) + number_or_zero(line2.b), min(limits) if limits else None, line1.name)
+
+def merge_files(uct_files: list, mode: str = "UX", uct_file_path: str = None, ignore_conflicts: bool = False, cache: "GridCache" = None) -> Grid:
+    return merge_grids([Grid(path, False, cache) for path in uct_files], mode, uct_file_path, ignore_conflicts)
+
+def restore_elements(grid_instance: Grid, elements: dict) -> "Elements":
+    # Used by pickle, indexes of the grid are restored with the grid itself
+    restored = Elements(grid_instance)
+    dict.update(restored, elements)
+    return restored
+
+class Elements(dict):
+    # Dictionary of grid elements that keeps indexes of its Grid up to date when elements are added or removed.
+    __slots__ = ["grid"]
+
+    def __init__(self, grid_instance: Grid):
+        super().__init__()
+        self.grid = grid_instance
+
+    def __setitem__(self, key, element):
+        if key in self: self.grid.__unindex_element__(key, self[key], element)
+        super().__setitem__(key, element)
+        self.grid.__index_element__(key, element)
+
+    def __delitem__(self, key):
+        self.grid.__unindex_element__(key, self[key])
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        element = self[key]
+        del self[key]
+        return element
+
+    def popitem(self):
+        key, element = super().popitem()
+        self.grid.__unindex_element__(key, element)
+        return key, element
+
+    def setdefault(self, key, default=None):
+        if key not in self: self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, element in dict(*args, **kwargs).items():
+            self[key] = element
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __reduce__(self):
+        return (restore_elements, (self.grid, dict(self)))
+
+    def clear(self):
+        for key, element in self.items():
+            self.grid.__unindex_element__(key, element)
+        super().clear()
 
 class Area:
     __slots__ = ["code", "grid"]
@@ -152,21 +984,20 @@ class Area:
         self.grid = grid_instance
 
     def nodes(self) -> dict:
-        return {key: item for key, item in self.grid.nodes.items() if item.area == self.code}
+        return dict(self.grid.area_nodes.get(self.code, {}))
     
     def xnodes(self) -> dict:
-        lines = self.lines().values()
-        nodes = []
-        for line in lines:
-            nodes.append(line.node1)
-            nodes.append(line.node2)
-        return {key: item for key, item in self.grid.areas["XX"].nodes().items() if key in nodes}
+        xnodes = self.grid.area_nodes.get("XX", {})
+        return {code: xnodes[code] for line in self.lines().values() for code in (line.node1, line.node2) if code in xnodes}
 
     def slack(self) -> list:
-        return [node for node in self.nodes().values() if node.node_type == 3]
+        return [node for node in self.grid.area_nodes.get(self.code, {}).values() if node.node_type == 3]
     
     def np(self, exclude_isolated_nodes: bool = False) -> float:
-        nodes = self.nodes().values()
+        totals = self.grid.np_totals
+        if not exclude_isolated_nodes and totals is not None and self.code in totals:
+            return -totals[self.code][0] - totals[self.code][1]
+        nodes = self.grid.area_nodes.get(self.code, {}).values()
         if exclude_isolated_nodes:
             not_isolated_nodes = [node for node in nodes if not node.isolated()]
             return -1*sum([node.pg for node in not_isolated_nodes]) - sum([node.pl for node in not_isolated_nodes])
@@ -181,13 +1012,17 @@ class Area:
             return -1*sum([node.pg for node in xnodes]) - sum([node.pl for node in xnodes])
 
     def lines(self) -> dict:
-        return {key: item for key, item in self.grid.lines.items() if self.grid.nodes[item.node1].area == self.code or self.grid.nodes[item.node2].area == self.code}
+        return dict(self.grid.__area_branches__(Line).get(self.code, {}))
     
     def transformers(self) -> dict:
-        return {key: item for key, item in self.grid.transformers.items() if self.grid.nodes[item.node1].area == self.code or self.grid.nodes[item.node2].area == self.code}
+        return dict(self.grid.__area_branches__(Transformer).get(self.code, {}))
+
+    def tielines(self) -> dict:
+        nodes = self.grid.area_nodes.get(self.code, {})
+        return {key: item for key, item in self.lines().items() if item.node1 not in nodes or item.node2 not in nodes}
     
     def schedules(self) -> dict:
-        return {key: item for key, item in self.grid.schedules.items() if item.country1 == self.code or item.country2 == self.code}
+        return dict(self.grid.area_schedules.get(self.code, {}))
 
     def __repr__(self) -> str:
         nodes = self.nodes()
@@ -195,11 +1030,495 @@ class Area:
         transf = self.transformers()
         return f"Area({self.code}, Nodes: {len(nodes) if nodes else 0}, Lines: {len(lines) if lines else 0}, Transformers: {len(transf) if transf else 0})"
     
+    def scale(self, attributes, factor: float = 1.0, shift: float = 0.0, **criteria) -> dict:
+        # Grid.scale of nodes of the area, e.g. area.scale("pl", 1.1) or area.scale("pg", shift=-10, plant_type="N")
+        return self.grid.scale(Node, attributes, factor, shift, area=self.code, **criteria)
+
     def uct(self, trim: bool = False) -> str:
-        return f"##Z{self.code}\n" + "\n".join([node.uct(trim) for node in self.nodes().values()]) + "\n"
+        output = io.StringIO()
+        self.write_uct(output, trim)
+        return output.getvalue()
+
+    def write_uct(self, file, trim: bool = False):
+        self.grid.__write_block__(file, f"##Z{self.code}\n", self.grid.area_nodes.get(self.code, {}).values(), trim)
+
+class GridArrays:
+    # Columnar snapshot of a Grid in NumPy structured arrays. Changes of the grid made after the snapshot are not reflected.
+    __slots__ = ["areas", "nodes", "branches", "branch_ids", "numpy"]
 
+    def __init__(self, grid_instance: Grid):
+        numpy = self.numpy = import_optional("numpy")
+        self.areas = list(grid_instance.areas)
+        area_index = {code: index for index, code in enumerate(self.areas)}
+        for node in grid_instance.nodes.values():
+            if node.area not in area_index:
+                area_index[node.area] = len(self.areas)
+                self.areas.append(node.area)
+        self.nodes = numpy.array([
+            (node.code, area_index[node.area], integer(node.status), integer(node.node_type), number(node.reference_voltage),
+             number(node.pl), number(node.ql), number(node.pg), number(node.qg), node.plant_type or "")
+            for node in grid_instance.nodes.values()
+        ], dtype=node_array_dtype)
+        node_index = {code: index for index, code in enumerate(grid_instance.nodes)}
+        self.branch_ids = [*grid_instance.lines, *grid_instance.transformers]
+        self.branches = numpy.array([
+            (0, node_index.get(line.node1, -1), node_index.get(line.node2, -1), integer(line.status),
+             number(line.r), number(line.x), number(line.b), numpy.nan, number(line.i_max), numpy.nan, numpy.nan, numpy.nan)
+            for line in grid_instance.lines.values()
+        ] + [
+            (1, node_index.get(transformer.node1, -1), node_index.get(transformer.node2, -1), integer(transformer.status),
+             number(transformer.r), number(transformer.x), number(transformer.b), number(transformer.g), number(transformer.i_max),
+             number(transformer.v1), number(transformer.v2), number(transformer.sn))
+            for transformer in grid_instance.transformers.values()
+        ], dtype=branch_array_dtype)
+
+    def in_service(self):
+        # Lines with status 0, 1, 2 and transformers with status 0, 1 (same as Node.isolated)
+        status = self.branches["status"]
+        lines = self.branches["kind"] == 0
+        return (lines & (status >= 0) & (status <= 2)) | (~lines & (status >= 0) & (status <= 1))
+
+    def isolated(self):
+        branches = self.branches[self.in_service()]
+        ends = self.numpy.concatenate([branches["node1"], branches["node2"]])
+        return self.numpy.bincount(ends[ends >= 0], minlength=len(self.nodes)) == 0
+
+    def slack(self):
+        return self.numpy.flatnonzero(self.nodes["node_type"] == 3)
+
+    def np(self, exclude_isolated_nodes: bool = False):
+        # Net positions of all areas in the order of GridArrays.areas
+        mask = ~self.isolated() if exclude_isolated_nodes else self.numpy.ones(len(self.nodes), dtype=bool)
+        injection = -self.numpy.nan_to_num(self.nodes["pg"]) - self.numpy.nan_to_num(self.nodes["pl"])
+        return self.numpy.bincount(self.nodes["area"][mask], weights=injection[mask], minlength=len(self.areas))
+
+    def xnp(self, exclude_isolated_nodes: bool = False):
+        # Net positions of X-nodes connected by lines to each area in the order of GridArrays.areas (same as Area.xnp)
+        numpy = self.numpy
+        if "XX" not in self.areas:
+            return numpy.zeros(len(self.areas))
+        xx = self.areas.index("XX")
+        lines = self.branches[(self.branches["kind"] == 0) & (self.branches["node1"] >= 0) & (self.branches["node2"] >= 0)]
+        area1, area2 = self.nodes["area"][lines["node1"]], self.nodes["area"][lines["node2"]]
+        pairs_area, pairs_node = [], []
+        for node, is_xnode in ((lines["node1"], area1 == xx), (lines["node2"], area2 == xx)):
+            for area in (area1, area2):
+                pairs_area.append(area[is_xnode])
+                pairs_node.append(node[is_xnode])
+        pairs = numpy.unique(numpy.concatenate(pairs_area).astype(numpy.int64) * len(self.nodes) + numpy.concatenate(pairs_node))
+        areas, nodes = pairs // len(self.nodes), pairs % len(self.nodes)
+        if exclude_isolated_nodes:
+            connected = ~self.isolated()[nodes]
+            areas, nodes = areas[connected], nodes[connected]
+        injection = -numpy.nan_to_num(self.nodes["pg"][nodes]) - numpy.nan_to_num(self.nodes["pl"][nodes])
+        return numpy.bincount(areas, weights=injection, minlength=len(self.areas))
+
+    def __repr__(self) -> str:
+        return f"GridArrays(Nodes: {len(self.nodes)}; Branches: {len(self.branches)}; Areas: {len(self.areas)})"
+
+class Topology:
+    # Islands of a Grid found by union-find over branches in service (lines with status 0, 1, 2 and transformers with status 0, 1, same as Node.isolated).
+    # Changes of the grid are not reflected, Grid.topology() builds a new one when the topology changes.
+    __slots__ = ["codes", "node_index", "island", "islands", "island_nodes", "branches", "branch_ids", "branch_nodes", "branch_numbers", "island_branches", "bridges"]
+
+    def __init__(self, grid_instance: Grid):
+        self.codes = list(grid_instance.nodes)
+        self.node_index = {code: index for index, code in enumerate(self.codes)}
+        self.branches = []
+        self.branch_ids = []
+        self.branch_nodes = []
+        for elements, in_service in ((grid_instance.lines, (0, 1, 2)), (grid_instance.transformers, (0, 1))):
+            for key, branch in elements.items():
+                if branch.status in in_service:
+                    self.branches.append(branch)
+                    self.branch_ids.append(key)
+                    self.branch_nodes.append((self.__node__(branch.node1), self.__node__(branch.node2)))
+        self.branch_numbers = {key: number for number, key in enumerate(self.branch_ids)}
+        parent = list(range(len(self.codes)))
+        size = [1] * len(self.codes)
+        for node1, node2 in self.branch_nodes:
+            root1, root2 = find_root(parent, node1), find_root(parent, node2)
+            if root1 == root2:
+                continue
+            if size[root1] < size[root2]: root1, root2 = root2, root1
+            parent[root2] = root1
+            size[root1] += size[root2]
+        members = {}
+        for node in range(len(self.codes)):
+            root = find_root(parent, node)
+            if root not in members: members[root] = []
+            members[root].append(node)
+        # Islands are numbered from the largest one
+        self.island_nodes = sorted(members.values(), key=len, reverse=True)
+        self.island = [0] * len(self.codes)
+        for number, nodes in enumerate(self.island_nodes):
+            for node in nodes:
+                self.island[node] = number
+        self.islands = [[self.codes[node] for node in nodes] for nodes in self.island_nodes]
+        self.island_branches = [[] for nodes in self.island_nodes]
+        for number, (node1, node2) in enumerate(self.branch_nodes):
+            self.island_branches[self.island[node1]].append(number)
+        self.bridges = None
+
+    def __node__(self, code: str) -> int:
+        # Branches may end in nodes missing from Grid.nodes, they still join islands
+        if code not in self.node_index:
+            self.node_index[code] = len(self.codes)
+            self.codes.append(code)
+        return self.node_index[code]
+
+    def island_of(self, node) -> int:
+        return self.island[self.node_index[getattr(node, "code", node)]]
+
+    def connected(self, node1, node2) -> bool:
+        return self.island_of(node1) == self.island_of(node2)
+
+    def __bridges__(self) -> set:
+        # Numbers of branches whose opening splits their island (iterative Tarjan, parallel branches are not bridges)
+        neighbors = [[] for code in self.codes]
+        for number, (node1, node2) in enumerate(self.branch_nodes):
+            if node1 != node2:
+                neighbors[node1].append((node2, number))
+                neighbors[node2].append((node1, number))
+        order = [0] * len(self.codes)
+        low = [0] * len(self.codes)
+        counter = 1
+        bridges = set()
+        for root in range(len(self.codes)):
+            if order[root]:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack = [(root, -1, iter(neighbors[root]))]
+            while stack:
+                node, entry, branches = stack[-1]
+                for neighbor, number in branches:
+                    if number == entry:
+                        continue
+                    if order[neighbor]:
+                        if order[neighbor] < low[node]: low[node] = order[neighbor]
+                        continue
+                    order[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append((neighbor, number, iter(neighbors[neighbor])))
+                    break
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        if low[node] < low[parent]: low[parent] = low[node]
+                        if low[node] > order[parent]: bridges.add(entry)
+        return bridges
+
+    def splits(self, *branches) -> bool:
+        # True if opening all the branches (elements or ids) increases the number of islands, branches out of service are ignored
+        opened = {self.branch_numbers[key] for key in (getattr(branch, "id", branch) for branch in branches) if key in self.branch_numbers}
+        if not opened:
+            return False
+        if self.bridges is None:
+            self.bridges = self.__bridges__()
+        if not opened.isdisjoint(self.bridges):
+            return True
+        if len(opened) == 1:
+            return False
+        # Without a bridge among them, the branches split the network only together, islands they belong to are checked again
+        for island in {self.island[self.branch_nodes[number][0]] for number in opened}:
+            parent = {node: node for node in self.island_nodes[island]}
+            components = len(parent)
+            for number in self.island_branches[island]:
+                if number in opened:
+                    continue
+                root1, root2 = find_root(parent, self.branch_nodes[number][0]), find_root(parent, self.branch_nodes[number][1])
+                if root1 != root2:
+                    parent[root2] = root1
+                    components -= 1
+            if components > 1:
+                return True
+        return False
+
+    def __repr__(self) -> str:
+        return f"Topology(Nodes: {len(self.codes)}; Branches in service: {len(self.branch_ids)}; Islands: {len(self.islands)})"
+
+class PowerFlow:
+    # DC power flow of a Grid on scipy sparse matrices. Branches and their parameters are taken from Grid.topology() when it is created,
+    # the susceptance matrix is factorized on the first solve and reused for all following injection vectors.
+    __slots__ = ["grid", "topology", "numpy", "sparse", "codes", "node_index", "branch_ids", "branch_nodes", "voltage", "branch_voltage", "resistance", "reactance", "shunt", "tap",
+                 "transformer", "susceptance", "shift", "incidence", "bbus", "references", "solved", "unknown", "factor"]
+
+    def __init__(self, grid_instance: Grid, slack: list = None):
+        numpy = self.numpy = import_optional("numpy")
+        self.sparse = import_optional("scipy.sparse")
+        import_optional("scipy.sparse.linalg")
+        self.grid = grid_instance
+        topology = self.topology = grid_instance.topology()
+        self.codes = topology.codes
+        self.node_index = topology.node_index
+        self.branch_ids = topology.branch_ids
+        self.voltage = numpy.array([nominal_voltage(code) for code in self.codes], dtype=float)
+        node1, node2 = self.branch_nodes = numpy.array(topology.branch_nodes, dtype=numpy.int64).reshape(-1, 2).T
+        branches = topology.branches
+        ratio, angle, r, x, g, b, v1, v2 = numpy.fromiter(itertools.chain.from_iterable(map(branch_parameters, branches)), float, 8 * len(branches)).reshape(-1, 8).T
+        self.transformer = numpy.fromiter(map(isinstance, branches, itertools.repeat(Transformer)), bool, len(branches))
+        self.branch_voltage = self.voltage[node1]
+        self.resistance = r #Ohm
+        self.reactance = numpy.where(numpy.abs(x) >= minimum_reactance, x, minimum_reactance) #Ohm, as by branch_reactance
+        self.shunt = g + 1j * b #uS
+        # Off-nominal ratio with phase shift of transformers applied at node 2 (rated voltages of windings related to nominal voltages of nodes), 1 for lines
+        v1 = numpy.where(v1 != 0, v1, self.voltage[node1])
+        v2 = numpy.where(v2 != 0, v2, self.voltage[node2])
+        self.tap = (v2 / self.voltage[node2]) / (v1 / self.voltage[node1]) * ratio * numpy.exp(1j * numpy.radians(angle))
+        self.susceptance = self.branch_voltage ** 2 / self.reactance #MW/rad
+        self.shift = -numpy.radians(angle) #rad, flow = susceptance * (incidence @ angles - shift)
+        rows = numpy.arange(len(self.branch_ids))
+        self.incidence = self.sparse.csr_matrix((numpy.concatenate([numpy.ones(len(rows)), -numpy.ones(len(rows))]), (numpy.concatenate([rows, rows]), numpy.concatenate([node1, node2]))),
+                                                shape=(len(self.branch_ids), len(self.codes)))
+        self.bbus = (self.incidence.T @ self.sparse.diags(self.susceptance) @ self.incidence).tocsc()
+        # One reference node per island, islands without a reference are not solved
+        if slack is None:
+            slack = [node.code for node in grid_instance.slack()] or (topology.islands[0][:1] if topology.islands else [])
+        references = {}
+        for node in slack:
+            references.setdefault(topology.island_of(node), self.node_index[getattr(node, "code", node)])
+        self.references = numpy.array(sorted(references.values()), dtype=numpy.int64)
+        self.solved = numpy.isin(numpy.array(topology.island), list(references))
+        self.unknown = numpy.flatnonzero(self.solved & ~numpy.isin(numpy.arange(len(self.codes)), self.references))
+        self.factor = None
+
+    def injections(self, grid_instance: Grid = None):
+        # Net injections -pg - pl (MW) of nodes of this or another grid with the same node codes in the order of codes
+        grid_instance = grid_instance or self.grid
+        injections = self.numpy.zeros(len(self.codes))
+        for code, node in grid_instance.nodes.items():
+            if code in self.node_index:
+                injections[self.node_index[code]] = -number_or_zero(node.pg) - number_or_zero(node.pl)
+        return injections
+
+    def angles(self, injections=None):
+        # Voltage angles (rad) of nodes for an injection vector or a matrix with one column per case, nan for nodes of islands without a reference
+        numpy = self.numpy
+        injections = self.injections() if injections is None else numpy.asarray(injections, dtype=float)
+        if self.factor is None:
+            self.factor = self.sparse.linalg.splu(self.bbus[self.unknown][:, self.unknown].tocsc())
+        shift = self.incidence.T @ (self.susceptance * self.shift)
+        angles = numpy.full(injections.shape, numpy.nan)
+        angles[self.solved] = 0.0
+        if len(self.unknown):
+            angles[self.unknown] = self.factor.solve(injections[self.unknown] + (shift[self.unknown, None] if injections.ndim == 2 else shift[self.unknown]))
+        return angles
+
+    def flows(self, injections=None):
+        # Active power flows (MW) from node1 to node2 of branches in the order of branch_ids
+        angles = self.angles(injections)
+        if angles.ndim == 2:
+            return self.susceptance[:, None] * (self.incidence @ angles - self.shift[:, None])
+        return self.susceptance * (self.incidence @ angles - self.shift)
+
+    def ybus(self, base_mva: float = 100.0):
+        # Complex admittance matrix in per unit of base_mva and nominal voltages of nodes
+        numpy = self.numpy
+        node1, node2 = self.branch_nodes
+        base1 = self.branch_voltage ** 2 / base_mva
+        series = base1 / (self.resistance + 1j * self.reactance)
+        # Impedance and shunt of transformers are related to winding 1, shunt of lines is split between both ends
+        shunt = self.shunt * 1e-6 * base1
+        shunt1 = numpy.where(self.transformer, shunt, shunt / 2)
+        shunt2 = numpy.where(self.transformer, 0, shunt / 2)
+        tap = self.tap
+        values = numpy.concatenate([series + shunt1, -series / tap, -series / tap.conj(), series / numpy.abs(tap) ** 2 + shunt2])
+        return self.sparse.csr_matrix((values, (numpy.concatenate([node1, node1, node2, node2]), numpy.concatenate([node1, node2, node1, node2]))), shape=(len(self.codes), len(self.codes)))
+
+    def contingency(self, injections=None) -> "Contingency":
+        return Contingency(self, injections)
+
+    def __repr__(self) -> str:
+        return f"PowerFlow(Nodes: {len(self.codes)}; Branches: {len(self.branch_ids)}; References: {len(self.references)}; Solved nodes: {int(self.solved.sum())})"
+
+class Contingency:
+    # PTDF and LODF of a PowerFlow and N-1 screening of branch outages against current limits. Holds only matrices and arrays,
+    # so it can be sent to worker processes, the factorization is made again in each process on first use.
+    __slots__ = ["numpy", "sparse", "branch_ids", "branch_index", "incidence", "susceptance", "bbus", "solved", "unknown", "base_flows", "limits", "factor"]
+
+    def __init__(self, power_flow: PowerFlow, injections=None):
+        numpy = self.numpy = power_flow.numpy
+        self.sparse = power_flow.sparse
+        self.branch_ids = power_flow.branch_ids
+        self.branch_index = {key: index for index, key in enumerate(self.branch_ids)}
+        self.incidence = power_flow.incidence
+        self.susceptance = power_flow.susceptance
+        self.bbus = power_flow.bbus
+        self.solved = power_flow.solved
+        self.unknown = power_flow.unknown
+        self.base_flows = power_flow.flows(injections)
+        # Limits (MW) from current limits at nominal voltage of node 1, branches without a limit are not screened
+        current = numpy.array([number(branch.i_max) for branch in power_flow.topology.branches], dtype=float)
+        self.limits = numpy.where(current > 0, math.sqrt(3) * power_flow.branch_voltage * current / 1000, numpy.inf)
+        self.factor = power_flow.factor
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ["numpy", "sparse", "factor"]}
+
+    def __setstate__(self, state: dict):
+        self.numpy = import_optional("numpy")
+        self.sparse = import_optional("scipy.sparse")
+        import_optional("scipy.sparse.linalg")
+        self.factor = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __indexes__(self, branches) -> list:
+        return list(range(len(self.branch_ids))) if branches is None else [self.branch_index[getattr(branch, "id", branch)] for branch in branches]
+
+    def __sensitivities__(self, injections):
+        # Flows of all branches (MW) caused by columns of nodal injections (sparse, 1 MW each), withdrawn at the reference of the island
+        numpy = self.numpy
+        if self.factor is None:
+            self.factor = self.sparse.linalg.splu(self.bbus[self.unknown][:, self.unknown].tocsc())
+        angles = numpy.zeros(injections.shape)
+        angles[~self.solved] = numpy.nan
+        if len(self.unknown):
+            angles[self.unknown] = self.factor.solve(injections[self.unknown].toarray())
+        return self.susceptance[:, None] * (self.incidence @ angles)
+
+    def ptdf(self, nodes: list = None):
+        # Power transfer distribution factors, branches in rows and node positions of PowerFlow.codes in columns
+        nodes = self.numpy.arange(self.incidence.shape[1]) if nodes is None else self.numpy.asarray(nodes)
+        injections = self.sparse.csr_matrix((self.numpy.ones(len(nodes)), (nodes, self.numpy.arange(len(nodes)))), shape=(self.incidence.shape[1], len(nodes)))
+        return self.__sensitivities__(injections)
+
+    def lodf(self, outages: list = None):
+        # Line outage distribution factors, branches in rows and outages (branches or ids) in columns, nan for outages that split an island
+        return self.__lodf__(self.__indexes__(outages))
+
+    def __lodf__(self, outages: list):
+        numpy = self.numpy
+        transfers = self.__sensitivities__(self.incidence[outages].T.tocsr())
+        columns = numpy.arange(len(outages))
+        remaining = 1 - transfers[outages, columns]
+        splitting = numpy.abs(remaining) < 1e-9
+        lodf = transfers / numpy.where(splitting, numpy.nan, remaining)
+        lodf[outages, columns] = -1.0
+        lodf[:, splitting] = numpy.nan
+        return lodf
+
+    def screen(self, outages: list = None, threshold: float = 1.0, workers: int = 1, batch_size: int = 256) -> "Screening":
+        # N-1 screening of outages (all branches in service by default) in batches, split between a pool of worker processes if workers is not 1
+        outages = self.__indexes__(outages)
+        if workers == 1 or len(outages) < 2 * batch_size:
+            parts = [screen_outages(self, outages, threshold, batch_size)]
+        else:
+            chunks = [list(chunk) for chunk in self.numpy.array_split(outages, workers or os.cpu_count() or 1) if len(chunk)]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                parts = list(executor.map(screen_outages, [self] * len(chunks), chunks, [threshold] * len(chunks), [batch_size] * len(chunks)))
+        return Screening(self, outages, parts)
+
+    def __repr__(self) -> str:
+        return f"Contingency(Branches: {len(self.branch_ids)}; Nodes: {self.incidence.shape[1]}; Limited branches: {int(self.numpy.isfinite(self.limits).sum())})"
+
+class Screening:
+    # Results of Contingency.screen in arrays in the order of outages
+    __slots__ = ["branch_ids", "outages", "index", "max_loading", "worst_branch", "overloads", "splitting", "violations"]
+
+    def __init__(self, contingency: Contingency, outages: list, parts: list):
+        numpy = contingency.numpy
+        self.branch_ids = contingency.branch_ids
+        self.outages = [self.branch_ids[outage] for outage in outages]
+        self.index = {key: position for position, key in enumerate(self.outages)}
+        self.max_loading = numpy.concatenate([part[0] for part in parts])
+        self.worst_branch = numpy.concatenate([part[1] for part in parts])
+        self.overloads = numpy.concatenate([part[2] for part in parts])
+        self.splitting = numpy.concatenate([part[3] for part in parts])
+        self.violations = [(self.outages[offset + outage], self.branch_ids[branch], flow, loading) for offset, part in zip(numpy.cumsum([0] + [len(part[0]) for part in parts]), parts) for outage, branch, flow, loading in part[4]]
+
+    def __getitem__(self, outage) -> Sub:
+        position = self.index[getattr(outage, "id", outage)]
+        worst_branch = self.worst_branch[position]
+        return Sub(max_loading=float(self.max_loading[position]), worst_branch=self.branch_ids[worst_branch] if worst_branch >= 0 else None,
+                   overloads=int(self.overloads[position]), splitting=bool(self.splitting[position]))
+
+    def __len__(self) -> int:
+        return len(self.outages)
+
+    def __repr__(self) -> str:
+        return f"Screening(Outages: {len(self.outages)}; With overloads: {int((self.overloads > 0).sum())}; Splitting: {int(self.splitting.sum())}; Violations: {len(self.violations)})"
+
+def screen_outages(contingency: Contingency, outages: list, threshold: float, batch_size: int) -> tuple:
+    # (max loading, worst branch, number of overloads, splitting, violations) of outages, loading of every branch after each outage is
+    # base flow + LODF * base flow of the outage divided by its limit, computed for batch_size outages at once
+    numpy = contingency.numpy
+    outages = numpy.asarray(outages, dtype=numpy.int64)
+    max_loading = numpy.full(len(outages), numpy.nan)
+    worst_branch = numpy.full(len(outages), -1, dtype=numpy.int64)
+    overloads = numpy.zeros(len(outages), dtype=numpy.int64)
+    splitting = numpy.zeros(len(outages), dtype=bool)
+    violations = []
+    # Only branches with a base flow and a limit are monitored, outages of branches in islands that were not solved are skipped
+    monitored = numpy.flatnonzero(numpy.isfinite(contingency.base_flows) & numpy.isfinite(contingency.limits))
+    solved = numpy.flatnonzero(numpy.isfinite(contingency.base_flows[outages]))
+    for start in range(0, len(solved), batch_size):
+        positions = solved[start:start + batch_size]
+        batch = outages[positions]
+        lodf = contingency.__lodf__(batch)
+        split = numpy.isnan(lodf[batch, numpy.arange(len(batch))])
+        splitting[positions] = split
+        positions, batch, lodf = positions[~split], batch[~split], lodf[monitored][:, ~split]
+        if not len(batch) or not len(monitored):
+            continue
+        flows = contingency.base_flows[monitored, None] + lodf * contingency.base_flows[batch][None, :]
+        loading = numpy.abs(flows) / contingency.limits[monitored, None]
+        worst = numpy.argmax(loading, axis=0)
+        max_loading[positions] = loading[worst, numpy.arange(len(batch))]
+        worst_branch[positions] = monitored[worst]
+        over = loading > threshold
+        overloads[positions] = over.sum(axis=0)
+        columns, rows = numpy.nonzero(over.T)
+        violations.extend(zip(positions[columns].tolist(), monitored[rows].tolist(), flows[rows, columns].tolist(), loading[rows, columns].tolist()))
+    return max_loading, worst_branch, overloads, splitting, violations
+
+def element_dataclass(cls):
+    # dataclass(slots=True), elements keep their fields in __slots__ instead of __dict__.
+    # Before Python 3.10 the dataclass is created again with __slots__ of its own fields and fields with init=False are set before __init__.
+    if sys.version_info >= (3, 10):
+        return dataclass(slots=True)(cls)
+    cls = dataclass(cls)
+    inherited = {name for base in cls.__mro__[1:] for name in getattr(base, "__slots__", [])}
+    names = [item.name for item in fields(cls) if item.name not in inherited]
+    namespace = {name: value for name, value in cls.__dict__.items() if name not in [*names, "__dict__", "__weakref__"]}
+    namespace["__slots__"] = names
+    slotted_class = type(cls)(cls.__name__, cls.__bases__, namespace)
+    defaults = [(item.name, item.default) for item in fields(cls) if not item.init]
+    init = slotted_class.__init__
+    def __init__(self, *args, **kwargs):
+        for name, default in defaults:
+            setattr(self, name, default)
+        init(self, *args, **kwargs)
+    slotted_class.__init__ = __init__
+    return slotted_class
+
+def watched_field(name: str, slot) -> property:
+    # Property of an attribute of watched_fields kept in its slot, the grid of the element is notified (Grid.__changed__) before a value is set
+    def setter(element, value):
+        grid_instance = element.grid
+        if grid_instance is not None: grid_instance.__changed__(element, name, value)
+        slot.__set__(element, value)
+    return property(slot.__get__, setter)
+
+def branch_id(element) -> str:
+    # Id of a line, transformer or regulation
+    return f"{element.node1:<8} {element.node2:<8} {element.order_code:<1}"
+
+@element_dataclass
 class Element():
-    grid: Grid = None
+    # grid is set when the element is loaded into a grid
+    grid: "Grid" = field(default=None, init=False, repr=False, compare=False)
+    uct_line: tuple = field(default=None, init=False, repr=False, compare=False) #(*values, line) kept by Grid.write_uct if Grid.uct_cache is True
+
+    def __reduce__(self):
+        # Used by pickle and copy, the element is created by its class and the grid is set by __setstate__ after the element is memoized
+        return (type(self), element_values[type(self)](self), self.grid)
+
+    def __setstate__(self, grid_instance: "Grid"):
+        self.grid = grid_instance
+
     def load_uct(self, UctText: str):
         regex = regex[self.__class__.__name__.lower()]
         rgx = re.compile(regex)
@@ -212,17 +1531,17 @@ class Element():
             try:
                 if function != "str":
                     setattr(self, name, functions[function](value.strip()))
+                elif name in interned_fields:
+                    setattr(self, name, sys.intern(value.strip()))
                 else:
                     setattr(self, name, value.strip())
             except:
                 setattr(self, name, None)
     
     def uct(self, trim: bool = False) -> str:
-        # if self.__class__.__name__ == "Node" and self.code == "XSK_KP51": pdb.set_trace()
-        output = " ". join([f"{conv(getattr(self, att), length)}" for att, length in uct_export[self.__class__.__name__].items()]) + " "
-        return output.strip() + " " if trim else output
+        return uct_formatters[self.__class__.__name__].format(self, trim)
 
-@dataclass()
+@element_dataclass
 class Node(Element):
     code: str = None #Node (code)
     name: str = None #Node (geographical name)
@@ -247,7 +1566,7 @@ class Node(Element):
 
     @property
     def voltage(self) -> int:
-        return uct_voltage[int(self.code[6])]
+        return nominal_voltage(self.code)
 
     @property
     def id(self) -> str:
@@ -255,32 +1574,17 @@ class Node(Element):
     
     
     def lines(self) -> list:
-        return [
-            line
-            for line in self.grid.lines.values()
-            if self.code in [line.node1, line.node2]
-        ]
+        return list(self.grid.node_lines.get(self.code, {}).values())
     
     def transformers(self) -> list:
-        return [
-            transformer
-            for transformer in self.grid.transformers.values()
-            if self.code in [transformer.node1, transformer.node2]
-        ]
+        return list(self.grid.node_transformers.get(self.code, {}).values())
 
     def isolated(self) -> bool:
-        return len([*[
-            line
-            for line in self.lines()
-            if line.status in [0, 1, 2]
-            ], *[
-                    transformer
-                    for transformer in self.transformers()
-                    if transformer.status in [0,1]
-                ]
-            ]) == 0
+        return not any(line.status in [0, 1, 2] for line in self.lines()) and not any(transformer.status in [0, 1] for transformer in self.transformers())
 
 class Connecting_Element:
+    __slots__ = []
+
     @property
     def oNode1(self) -> Node:
         return self.grid.nodes[self.node1]
@@ -290,7 +1594,7 @@ class Connecting_Element:
         return self.grid.nodes[self.node2]
 
 
-@dataclass
+@element_dataclass
 class Line(Element, Connecting_Element):
     node1: str = None #Node 1 (code)
     node2: str = None #Node 2 (code)
@@ -302,9 +1606,7 @@ class Line(Element, Connecting_Element):
     i_max: int = None #Current limit I (A)
     name: str = None #Element name (optional) ***
 
-    @property
-    def id(self):
-        return f"{self.node1:<8} {self.node2:<8} {self.order_code:<1}"
+    id = property(branch_id)
     
     @property
     def pslfId(self) ->str:
@@ -313,7 +1615,7 @@ class Line(Element, Connecting_Element):
         else:
             return None
 
-@dataclass
+@element_dataclass
 class Transformer(Element, Connecting_Element):
     node1: str = None #Node 1 ( code) (non-regulated winding)
     node2: str = None #Node 2 ( code) (regulated winding)
@@ -331,11 +1633,36 @@ class Transformer(Element, Connecting_Element):
     regulation: any = None
     parameters: list = field(default_factory=lambda: [])
 
-    @property
-    def id(self):
-        return f"{self.node1:<8} {self.node2:<8} {self.order_code:<1}"
+    id = property(branch_id)
+
+    def tap(self) -> tuple:
+        # (voltage ratio factor, phase shift angle in degrees, r, x) of the regulated winding at current tap positions of the regulation,
+        # special parameters (##TT) of the current tap replace values computed from the regulation
+        ratio, angle, r, x = 1.0, 0.0, self.r, self.x
+        regulation = self.regulation
+        if regulation is None:
+            return ratio, angle, r, x
+        if regulation.phase_delta_u is not None and regulation.phase_tap is not None:
+            ratio += regulation.phase_tap * regulation.phase_delta_u / 100
+        angle_regulation = regulation.angle_delta_u is not None and regulation.angle_tap is not None
+        if angle_regulation:
+            delta_u = regulation.angle_tap * regulation.angle_delta_u / 100
+            phi = math.radians(regulation.angle_phi or 0.0)
+            if regulation.angle_type == "SYMM":
+                angle = math.degrees(2 * math.atan(delta_u * math.sin(phi) / 2))
+            else:
+                angle = math.degrees(math.atan2(delta_u * math.sin(phi), 1 + delta_u * math.cos(phi)))
+                ratio *= math.hypot(1 + delta_u * math.cos(phi), delta_u * math.sin(phi))
+        current_tap = regulation.angle_tap if angle_regulation else regulation.phase_tap
+        for parameter in self.parameters:
+            if parameter.tap == current_tap:
+                ratio = 1 + (parameter.delta_u or 0.0) / 100
+                angle = parameter.alfa or 0.0
+                r = self.r if parameter.r is None else parameter.r
+                x = self.x if parameter.x is None else parameter.x
+        return ratio, angle, r, x
 
-@dataclass
+@element_dataclass
 class Regulation(Element):
     node1: str = None #Node 1 (code) (non-regulated winding)
     node2: str = None #Node 2 (code) (regulated winding)
@@ -351,11 +1678,9 @@ class Regulation(Element):
     angle_p: float = None #P (MW)* (optional) 
     angle_type: str = None #Type* (ASYM: asymmetrical, SYMM: symmetrical) 
 
-    @property
-    def id(self):
-        return f"{self.node1:<8} {self.node2:<8} {self.order_code:<1}"
+    id = property(branch_id)
 
-@dataclass
+@element_dataclass
 class Parameter(Element):
     node1: str = None #Node 1 (code) (non-regulated winding)
     node2: str = None #Node 2 (code) (regulated winding)
@@ -374,7 +1699,7 @@ class Parameter(Element):
     def transformer_id(self):
         return f"{self.node1:<8} {self.node2:<8} {self.order_code:<1}"
 
-@dataclass
+@element_dataclass
 class Schedule(Element):
     country1: str = None #Country 1 (ISO code)
     country2: str = None #Country 2 (ISO code)
@@ -385,6 +1710,164 @@ class Schedule(Element):
     def id(self):
         return f"{self.country1:<2} {self.country2:<2}"
 
+class Decoder:
+    # Slices fixed-width uct records directly instead of matching rgx[element] and splitting group names.
+    # decode() returns None whenever the regex could behave differently (separator mismatch, short line, second match on the same line),
+    # so the caller falls back to the regex for that line and results stay identical.
+    __slots__ = ["element_class", "required", "optional", "separators", "blanks", "min_length"]
+
+    def __init__(self, element_class, required_fields: int, failures: dict = None):
+        # failures {field name: count} is increased for values that can't be converted (used by ProfiledSection)
+        self.element_class = element_class
+        export = uct_export[element_class.__name__]
+        columns = []
+        position = 0
+        for item in [item for item in fields(element_class) if item.init][:len(export)]:
+            if item.name in interned_fields:
+                function = intern_strip
+            else:
+                function = converters[item.type] if failures is None or item.type == str else convert(item.type, failures, item.name)
+            columns.append((position, position + export[item.name], function))
+            position += export[item.name] + 1
+        self.required = columns[:required_fields]
+        self.optional = [(end - start, function) for start, end, function in columns[required_fields:]]
+        self.separators = operator.itemgetter(*[start - 1 for start, end, function in self.required[1:]])
+        self.blanks = (" ",) * (required_fields - 1)
+        self.min_length = self.required[-1][1]
+
+    def decode(self, line: str):
+        length = len(line)
+        if length < self.min_length or self.separators(line) != self.blanks:
+            return None
+        values = [function(line[start:end]) for start, end, function in self.required]
+        position = self.min_length
+        for width, function in self.optional:
+            if length > position + width and line[position] == " ":
+                values.append(function(line[position + 1:position + 1 + width]))
+                position += width + 1
+            else:
+                values.append(None)
+        if length - position >= self.min_length:
+            return None
+        return self.element_class(*values)
+
+def convert(function, failures: dict = None, name: str = None):
+    # Same result as load_from_regex_dictionary: int() and float() strip the value themselves, blank or invalid values give None
+    def converter(value: str):
+        if value.isspace():
+            return None
+        try:
+            return function(value)
+        except ValueError:
+            if failures is not None: failures[name] = failures.get(name, 0) + 1
+            return None
+    return converter
+
+converters = {
+    str: str.strip,
+    int: convert(int),
+    float: convert(float)
+}
+
+class Section:
+    # One directive block of a uct file (##C, ##N/##Z, ##L, ##T, ##R, ##TT, ##E) decoded line by line.
+    __slots__ = ["record_type", "area", "version", "records", "not_read", "text", "number_of_elements", "content", "decoder"]
+
+    def __init__(self, record_type: str, area: str = None, version: str = None):
+        self.record_type = record_type
+        self.decoder = decoders.get(record_type)
+        self.area = area
+        self.version = version
+        self.records = []
+        self.not_read = []
+        self.text = None
+        self.number_of_elements = 0
+        self.content = False
+
+    def add(self, line: str):
+        if self.record_type == "Comment":
+            # rgx["comment"] swallows one empty line right after the ##C header
+            if self.records or line != "\n": self.records.append(line)
+            return
+        line = line.rstrip("\n")
+        if not line: return
+        if not self.content and not line.isspace(): self.content = True
+        if not line[0].isspace(): self.number_of_elements += 1
+        element = self.decoder.decode(line)
+        if element:
+            self.records.append(element)
+            return
+        self.__fallback__(line)
+
+    def __fallback__(self, line: str):
+        # Fallback to the regex for records the decoder cannot slice unambiguously
+        for el_match in rgx[self.record_type].finditer(line):
+            element = globals()[self.record_type]()
+            element.load_from_regex_dictionary(el_match.groupdict())
+            self.records.append(element)
+        if not rgx[self.record_type].match(line): self.not_read.append(line)
+
+    def finish(self):
+        if self.record_type == "Comment":
+            self.text = "".join(self.records)
+            self.records = []
+        elif len(self.records) == self.number_of_elements:
+            self.not_read = []
+        return self
+
+    def __repr__(self) -> str:
+        return f"Section({self.record_type}, Area: {self.area}, Records: {len(self.records)}, Not read: {len(self.not_read)})"
+
+class ProfiledSection(Section):
+    # Section used when Grid.load_stats is enabled, lines are parsed the same way
+    __slots__ = ["characters", "fallbacks", "failed_conversions"]
+
+    def __init__(self, record_type: str, area: str = None, version: str = None):
+        super().__init__(record_type, area, version)
+        self.characters = 0 #Characters of the block lines
+        self.fallbacks = 0
+        self.failed_conversions = {} #{field name: number of records with a value that could not be converted}
+        if record_type in decoders:
+            # Own decoder counting values that could not be converted
+            self.decoder = Decoder(decoders[record_type].element_class, uct_required[record_type], self.failed_conversions)
+
+    def add(self, line: str):
+        self.characters += len(line)
+        Section.add(self, line)
+
+    def __fallback__(self, line: str):
+        self.fallbacks += 1
+        count = len(self.records)
+        Section.__fallback__(self, line)
+        for element, el_match in zip(self.records[count:], rgx[self.record_type].finditer(line)):
+            for key, value in el_match.groupdict().items():
+                name, function = key.split("__")
+                if function != "str" and value.strip() and getattr(element, name) is None:
+                    self.failed_conversions[name] = self.failed_conversions.get(name, 0) + 1
+
+def iter_records(uct_file, profile: bool = False):
+    # Single pass over a uct file path or an open file (any iterable of text lines), yields Section objects in file order.
+    # With profile, ProfiledSection objects counting characters and regex fallbacks are yielded.
+    if isinstance(uct_file, str):
+        with open(uct_file) as file:
+            yield from iter_records(file, profile)
+        return
+    section_class = ProfiledSection if profile else Section
+    section = None
+    for line in uct_file:
+        if line.startswith("##"):
+            if section and (section.content or section.record_type == "Comment"): yield section.finish()
+            directive = rgx["directive"].match(line)
+            if not directive:
+                section = None
+            elif directive.group("comment"):
+                section = section_class("Comment", version=directive.group("version"))
+            else:
+                section = section_class(uct_directives[directive.group("directive") or "Z"], area=directive.group("area"))
+        elif section:
+            section.add(line)
+    if section and (section.content or section.record_type == "Comment"): yield section.finish()
+
 def conv(property_value, width:int) -> str:
     if property_value in [None, ""]:
         return " " * width
@@ -408,14 +1891,128 @@ def conv(property_value, width:int) -> str:
     else:
         return f"{(property_value+' '*width)[:width]}"
 
+def number(value) -> float:
+    return float("nan") if value is None else value
+
+def integer(value) -> int:
+    return -1 if value is None else value
+
+def intern_strip(value: str, intern = sys.intern) -> str:
+    return intern(value.strip())
+
+def intern_value(value: str, intern = sys.intern) -> str:
+    return None if value is None else intern(value)
+
+def find_root(parent, node: int) -> int:
+    # Union-find root with path halving, parent is a list or a dictionary of node parents
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+def number_or_zero(value) -> float:
+    return 0.0 if value is None else value
+
+def branch_reactance(x: float) -> float:
+    # Reactance below the UCTE-DEF minimum (or missing) is replaced by the minimum, so that susceptance of every branch is finite
+    return x if x is not None and abs(x) >= minimum_reactance else minimum_reactance
+
+def branch_parameters(branch) -> tuple:
+    # (ratio, angle, r, x, g, b, v1, v2) of a line or a transformer for PowerFlow with missing values as 0.0, ratio and angle of transformers at current taps
+    if isinstance(branch, Transformer):
+        ratio, angle, r, x = branch.tap()
+        return ratio, angle, r or 0.0, x or 0.0, branch.g or 0.0, branch.b or 0.0, branch.v1 or 0.0, branch.v2 or 0.0
+    return 1.0, 0.0, branch.r or 0.0, branch.x or 0.0, 0.0, branch.b or 0.0, 0.0, 0.0
+
+def nominal_voltage(node_code: str) -> int:
+    return voltage_codes[node_code[6]]
+
+def select_matches(value, criterion) -> bool:
+    if callable(criterion):
+        return criterion(value)
+    if type(criterion) in (list, set):
+        return value in criterion
+    return value == criterion
+
+def branch_areas(grid_instance: Grid, element) -> tuple:
+    # Areas of both nodes of a line or transformer in alphabetical order, None for a node missing in the grid
+    nodes = grid_instance.nodes
+    return tuple(sorted((nodes[code].area if code in nodes else None for code in (element.node1, element.node2)), key=str))
+
+def import_optional(module_name: str):
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise Exception(f"Module {module_name} is required for this feature (pip install {module_name.split('.')[0]})")
+
+def field_formatter(width: int, field_type: type = None):
+    # conv() with limits and format specifications of the width computed once, numbers are converted to field_type (int or float) first
+    blank = " " * width
+    upper, lower = (10**width)-1, -1*(10**(width-1))+1
+    upper_text, lower_text = f"{upper}", f"{lower}"
+    large, small = (10**(width-2))-1, -1*(10**(width-3))+1
+    large_spec, small_spec = f"{width}.0f", f"{width-1}.0f"
+    specs = [f"{width}.{dec}f" for dec in range(width + 1)]
+    def formatter(property_value) -> str:
+        if property_value in [None, ""]:
+            return blank
+        elif type(property_value) != str:
+            if field_type is not None and type(property_value) is not field_type:
+                property_value = field_type(property_value)
+            if property_value > upper:
+                return upper_text
+            elif property_value < lower:
+                return lower_text
+            elif property_value > large:
+                return format(property_value, large_spec)
+            elif property_value < small:
+                return format(property_value, small_spec)
+            else:
+                dec = width - len(f"{int(property_value)}")-1 if type(property_value)!=int else 0
+                if math.copysign(1, property_value) < 0: dec = max(dec - 1,0)
+                return format(round(property_value,dec), specs[dec])
+        else:
+            return (property_value + blank)[:width]
+    return formatter
+
+class Formatter:
+    # Precompiled uct record formatter of one element type, output is the same as of conv() applied to every attribute converted to the type of its field.
+    __slots__ = ["values", "functions"]
+
+    def __init__(self, class_name: str):
+        self.values = operator.attrgetter(*uct_export[class_name])
+        types = {item.name: item.type for item in fields(globals()[class_name])}
+        self.functions = [field_formatter(width, types.get(name) if types.get(name) in (int, float) else None) for name, width in uct_export[class_name].items()]
+
+    def format(self, element, trim: bool = False, cache: bool = False) -> str:
+        # If cache is True, the line is kept in Element.uct_line after the formatted values and reused while all values are the same objects
+        values = self.values(element)
+        kept = element.uct_line if cache else None
+        if kept is not None and all(map(operator.is_, values, kept)):
+            output = kept[-1]
+        else:
+            output = " ".join([function(value) for function, value in zip(self.functions, values)]) + " "
+            if cache: element.uct_line = values + (output,)
+        return output.strip() + " " if trim else output
+
 functions = {
     "float" : float,
     "str" : str,
     "int": int
 }
 
+key_fields = {"code", "area", "node1", "node2", "order_code", "tap", "country1", "country2"} #Fields of ids and Grid indexes, not changed by Grid.scale and Grid.assign
+
+interned_fields = {"code", "node1", "node2", "order_code", "country1", "country2", "plant_type", "angle_type"} #Decoded strings shared by all elements instead of a copy in every element
+
+line_status_classes = {0: (0, 8), 8: (0, 8), 1: (1, 9), 9: (1, 9), 2: (2, 7), 7: (2, 7)} #{line status: (status in operation, status out of operation)} of real elements, equivalent elements and busbar couplers
+
 uct_voltage = [750, 380, 220, 150, 120, 110, 70, 27, 330, 500]
 
+voltage_codes = {str(code): voltage for code, voltage in enumerate(uct_voltage)} #{7th character of node code: nominal voltage (kV)}
+
+minimum_reactance = 0.05 #Ohm, smallest absolute reactance of a branch allowed by UCTE-DEF
+
 countries = {
     "AL" : {"number": 2 , "node": "A" , "code": "AL", "name": "Albania"    , "long_name": "Shqiperia (Albania)"                         , "code2": "AL" , "cgm": False, "pslf_code": 21  , "pslf_name": "Albansko"           },
     "AT" : {"number": 1 , "node": "O" , "code": "AT", "name": "Austria"    , "long_name": "Österreich (Austria)"                        , "code2": "A"  , "cgm": False, "pslf_code": 18  , "pslf_name": "Rakusko"            },
@@ -477,6 +2074,8 @@ file_regex_parts = [
 
 rgx = {
   "file": re.compile("".join(file_regex_parts)),
+  "directive_start": re.compile(rb"^##", re.MULTILINE),
+  "directive": re.compile(r"##(?:(?P<comment>C)\s*?(?P<version>\S.*?)?|\s*?(?:(?P<directive>TT|[NLTRE])|Z\s*?(?P<area>\w{2})))\s*$"),
   "comment": re.compile(r"##C\s*?(?P<version>\S.*?\S)?\s*?[\r\n]{1,2}(?P<text>(?:.*?[\r\n]?)+?)(?=##|\Z)"),
   "Nodes": re.compile(r"##\s*?(?:N|Z\s*?(?P<area>\w{2}))\s*?[\r\n](?!\s*?(?=##|\Z))(?P<elements>.*?)(?=##|\Z)", re.DOTALL),
   "Node": re.compile(r"(?P<code__str>.{8}) (?P<name__str>.{12}) (?P<status__int>.{1}) (?P<node_type__int>.{1}) (?P<reference_voltage__float>.{6}) (?P<pl__float>.{7}) (?P<ql__float>.{7}) (?P<pg__float>.{7}) (?P<qg__float>.{7})(?: (?P<pg_min__float>.{7}))?(?: (?P<pg_max__float>.{7}))?(?: (?P<qg_min__float>.{7}))?(?: (?P<qg_max__float>.{7}))?(?: (?P<static_of_primary_control__float>.{5}))?(?: (?P<primary_control_PN__float>.{7}))?(?: (?P<sk3__float>.{7}))?(?: (?P<x_to_r__float>.{7}))?(?: (?P<plant_type__str>.{1}))?"),
@@ -513,4 +2112,53 @@ uct_export = {
     "Schedule": {
         "country1": 2, "country2": 2, "schedule": 7, "comments": 12
     }
-}
\ No newline at end of file
+}
+
+node_array_dtype = [("code", "U8"), ("area", "i4"), ("status", "i1"), ("node_type", "i1"), ("reference_voltage", "f8"),
+                    ("pl", "f8"), ("ql", "f8"), ("pg", "f8"), ("qg", "f8"), ("plant_type", "U1")]
+
+branch_array_dtype = [("kind", "i1"), ("node1", "i4"), ("node2", "i4"), ("status", "i1"), ("r", "f8"), ("x", "f8"), ("b", "f8"), ("g", "f8"),
+                      ("i_max", "f8"), ("v1", "f8"), ("v2", "f8"), ("sn", "f8")]
+
+grid_indexes = {
+    Node: ("area_nodes", lambda element: (element.area,)), #{area code: {Node.id: Node}}
+    Line: ("node_lines", lambda element: (element.node1, element.node2)), #{node code: {Line.id: Line}}
+    Transformer: ("node_transformers", lambda element: (element.node1, element.node2)), #{node code: {Transformer.id: Transformer}}
+    Parameter: ("transformer_parameters", lambda element: (element.transformer_id,)), #{Parameter.transformer_id: {Parameter.id: Parameter}}
+    Schedule: ("area_schedules", lambda element: (element.country1, element.country2)) #{area code: {Schedule.id: Schedule}}
+}
+
+select_indexes = { #{element class: {criterion: None for attribute of the same name, name of Grid index or function(grid, element) returning the indexed value}} used by Grid.select
+    Node: {"voltage": lambda grid_instance, node: voltage_codes.get(node.code[6:7]), "area": "area_nodes", "plant_type": None, "node_type": None, "status": None},
+    Line: {"voltage": lambda grid_instance, line: voltage_codes.get(line.node1[6:7]), "areas": branch_areas, "node": "node_lines", "status": None},
+    Transformer: {"areas": branch_areas, "node": "node_transformers", "status": None},
+    Schedule: {"country": "area_schedules"}
+}
+
+watched_fields = {element_class: {*(name for name, key in criteria.items() if key is None), *(["pg", "pl"] if element_class is Node else [])} for element_class, criteria in select_indexes.items()} #{element class: attributes with Grid caches updated by their properties (Grid.np_totals, Grid.select_cache)}
+
+arrow_types = {str: lambda pyarrow: pyarrow.string(), int: lambda pyarrow: pyarrow.int64(), float: lambda pyarrow: pyarrow.float64()} #Arrow column types of element fields
+
+grid_cache_version = 4 #Increase when content of Grid.__cache_state__ changes
+
+snapshot_fields = {name: [item.name for item in fields(globals()[name]) if item.init and item.name not in ["regulation", "parameters"]] for name in uct_export}
+
+uct_formatters = {name: Formatter(name) for name in uct_export}
+
+element_values = {globals()[name]: operator.attrgetter(*[item.name for item in fields(globals()[name]) if item.init]) for name in uct_export} #Values of all fields passed to the element class
+
+element_slots = {globals()[name]: {slot: cls.__dict__[slot] for cls in reversed(globals()[name].__mro__) for slot in cls.__dict__.get("__slots__", ())} for name in uct_export} #{element class: {attribute: slot}}, slots of watched_fields are replaced by properties below
+
+for element_class, names in watched_fields.items():
+    for name in names:
+        setattr(element_class, name, watched_field(name, element_slots[element_class][name]))
+
+uct_directives = {"N": "Node", "Z": "Node", "L": "Line", "T": "Transformer", "R": "Regulation", "TT": "Parameter", "E": "Schedule"}
+
+uct_required = {"Node": 9, "Line": 8, "Transformer": 12, "Regulation": 6, "Parameter": 8, "Schedule": 3}
+
+lazy_attributes = {"areas": "Node", **{name.lower() + "s": name for name in uct_required}, **{index: indexed_class.__name__ for indexed_class, (index, keys) in grid_indexes.items()}} #Grid attributes set when sections of the record type are parsed
+
+cached_attributes = ["uct_version", "comments", "not_read", *lazy_attributes] #Grid attributes stored by GridCache
+
+decoders = {name: Decoder(globals()[name], required) for name, required in uct_required.items()}